@@ -1,16 +1,51 @@
-from flask import Flask
-from threading import Thread
+"""Tiny health-check server so Render's port scan keeps the dyno alive.
 
-app = Flask('')
+Preferred path is aiohttp on the bot's own event loop — no extra OS
+thread, no GIL handoff on every ping. If aiohttp is not installed the
+old Flask-in-a-thread server is used instead.
+"""
 
-@app.route('/')
-def home():
-    return "I am alive! Bot is running..."
+try:
+    from aiohttp import web
+except ImportError:
+    web = None
 
-def run():
-    # Port 8080 is standard for Render web services
-    app.run(host='0.0.0.0', port=8080)
+PORT = 8080  # Standard for Render web services
+
+
+async def start_keepalive():
+    """Starts the health server on the running event loop.
+
+    Falls back to the threaded Flask server when aiohttp is missing.
+    Returns the aiohttp AppRunner (for cleanup) or None on the fallback.
+    """
+    if web is None:
+        keep_alive()
+        return None
+
+    async def home(request):
+        return web.Response(text="I am alive! Bot is running...")
+
+    app = web.Application()
+    app.router.add_get('/', home)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '0.0.0.0', PORT)
+    await site.start()
+    return runner
+
+
+# --- Legacy threaded Flask server (fallback when aiohttp is absent) ---
 
 def keep_alive():
-    t = Thread(target=run)
-    t.start()
\ No newline at end of file
+    from threading import Thread
+    from flask import Flask
+
+    flask_app = Flask('')
+
+    @flask_app.route('/')
+    def home():
+        return "I am alive! Bot is running..."
+
+    t = Thread(target=lambda: flask_app.run(host='0.0.0.0', port=PORT))
+    t.start()
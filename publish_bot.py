@@ -24,16 +24,20 @@ Usage:
 
 import asyncio
 import logging
-from logging.handlers import RotatingFileHandler # <-- NEW: Auto-deletes old logs
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 import sqlite3
+import threading
+import queue
 import os
 import shutil # <-- NEW: For deleting folders/files easily
 import time
 import random
+import itertools
 import sys
 import traceback
 from datetime import datetime
 from typing import List, Optional, Dict, Union, Any, Tuple
+from collections import OrderedDict
 
 # --- Third Party Imports ---
 from dotenv import load_dotenv
@@ -58,7 +62,6 @@ from pyrogram.errors import (
 )
 
 # --- Local Imports ---
-from keep_alive import keep_alive
 
 # 1. Load Environment Variables (Sabse Pehle)
 load_dotenv()
@@ -84,27 +87,73 @@ if not API_HASH or not BOT_TOKEN or API_ID == 0:
 
 # --- 📂 STORAGE MANAGEMENT (Render Free Tier Optimization) ---
 DB_NAME = "enterprise_bot.db"
+
+# 🔥 Hot SQL as module constants: the same string object is passed to
+# execute() every time, so SQLite's per-connection statement cache hits
+# without re-parsing or re-planning.
+SQL_GET_SETTING = "SELECT value FROM settings WHERE key=?"
+SQL_SET_SETTING = (
+    "INSERT INTO settings (key, value) VALUES (?, ?) "
+    "ON CONFLICT(key) DO UPDATE SET value=excluded.value"
+)
+SQL_ADD_PENDING = "INSERT OR IGNORE INTO pending (chat_id, msg_id, is_vip) VALUES (?, ?, ?)"
+SQL_DEL_PENDING = "DELETE FROM pending WHERE chat_id=? AND msg_id=?"
 LOG_FILE = "system.log"
+# 👷 Parallel publish workers. Default 1 keeps the classic strict cadence
+# (one post per 'delay'); raise it only if you accept interleaved pacing.
+WORKER_COUNT = max(1, int(os.getenv("WORKER_COUNT", "1")))
 DOWNLOAD_PATH = "downloads/" # <-- NEW: Dedicated folder for temp files
 
 # Create downloads folder if not exists
 if not os.path.exists(DOWNLOAD_PATH):
     os.makedirs(DOWNLOAD_PATH)
 
-# --- 📝 LOGGING CONFIGURATION (Space Saver) ---
+# --- 📝 LOGGING CONFIGURATION (Space Saver + Non-Blocking) ---
 # RotatingFileHandler:
 # - maxBytes=5MB: File 5MB se badi nahi hogi.
 # - backupCount=1: Sirf 1 purani file rakhega, baaki delete kar dega.
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - [%(levelname)s] - %(name)s - %(message)s',
-    handlers=[
-        RotatingFileHandler(LOG_FILE, maxBytes=5*1024*1024, backupCount=1), 
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# Records pass through an in-memory queue; a background QueueListener
+# does the actual disk/TTY writes so handlers never block the loop.
+_log_handlers = [RotatingFileHandler(LOG_FILE, maxBytes=5*1024*1024, backupCount=1, delay=True)]
+if os.getenv("CONSOLE_LOG", "1") == "1":  # set CONSOLE_LOG=0 to silence stdout
+    _log_handlers.append(logging.StreamHandler(sys.stdout))
+_log_formatter = logging.Formatter('%(asctime)s - [%(levelname)s] - %(name)s - %(message)s')
+for _h in _log_handlers:
+    _h.setFormatter(_log_formatter)
+_log_queue: "queue.Queue" = queue.Queue(-1)
+logging.basicConfig(level=logging.INFO, handlers=[QueueHandler(_log_queue)])
+_log_listener = QueueListener(_log_queue, *_log_handlers, respect_handler_level=True)
+_log_listener.start()
 logger = logging.getLogger("EnterpriseBot")
 
+
+class _RepeatErrorFilter(logging.Filter):
+    """
+    Storm guard: identical ERROR+ records within 1 second are dropped
+    before formatting, so a FloodWait/RPC error storm can't melt the
+    log pipeline with thousands of copies of the same line.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._last_seen: Dict[Any, float] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.ERROR:
+            return True
+        key = (record.msg, record.args)
+        now = time.monotonic()
+        try:
+            if now - self._last_seen.get(key, -1.0) < 1.0:
+                return False
+            self._last_seen[key] = now
+        except TypeError:
+            return True  # Unhashable args: let it through
+        return True
+
+
+logger.addFilter(_RepeatErrorFilter())
+
 # Suppress noisy logs from Pyrogram (Clean Console)
 logging.getLogger("pyrogram").setLevel(logging.WARNING)
 
@@ -122,8 +171,33 @@ class DatabaseManager:
         self.db_name = db_name
         self.conn = None
         self.cursor = None
+        # 🔒 One lock for all writers (SQLite serializes per-connection anyway,
+        # but this keeps execute+commit pairs atomic across threads).
+        self._lock = threading.RLock()
+        # 📊 Pending stats counters; flushed to SQLite in one UPSERT batch
+        self._stat_delta = {"processed": 0, "stickers": 0, "errors": 0}
+        # Cached "today" string keyed by epoch day (avoids datetime.now()
+        # object construction on every flush)
+        self._today_epoch_day = -1
+        self._today_str = ""
+        # Memoized int-parsed settings (delay, target_channel, ...)
+        self._int_cache: Dict[str, int] = {}
+        # ⚡ RAM Cache: settings change rarely but are read on every message,
+        # so serve reads from this dict and write-through in set_setting().
+        self._settings_cache: Dict[str, str] = {}
+        # Immutable snapshot of active sticker packs (random.choice-ready,
+        # no per-message SELECT or list rebuild).
+        self._packs_cache: Tuple[str, ...] = ()
+        # Admin allow-list mirrored in RAM: authorization is checked on
+        # every single update, so it must be an O(1) set lookup.
+        self._admin_cache: set = set()
         self.connect()
         self.init_tables()
+        # 🧵 Single writer thread: mutations are queued and committed in
+        # batches so async handlers never stall on a WAL fsync.
+        self._write_queue: "queue.Queue[Tuple[str, Tuple]]" = queue.Queue()
+        self._writer = threading.Thread(target=self._writer_loop, daemon=True, name="db-writer")
+        self._writer.start()
 
     def connect(self):
         """
@@ -134,7 +208,8 @@ class DatabaseManager:
             self.conn = sqlite3.connect(
                 self.db_name, 
                 check_same_thread=False, 
-                timeout=30.0
+                timeout=30.0,
+                cached_statements=256
             )
             # Row Factory allows accessing columns by name (More professional)
             self.conn.row_factory = sqlite3.Row 
@@ -143,12 +218,36 @@ class DatabaseManager:
             # 🔥 PERFORMANCE HACK: Enable WAL Mode (Faster, No Locking)
             self.cursor.execute("PRAGMA journal_mode=WAL;")
             self.cursor.execute("PRAGMA synchronous=NORMAL;")
-            
+            self.cursor.execute("PRAGMA temp_store=MEMORY;")
+            self.cursor.execute("PRAGMA cache_size=-64000;")  # 64MB page cache
+            self.cursor.execute("PRAGMA mmap_size=134217728;")  # 128MB mmap'd reads
+
+            self._connect_readonly()
+
             logger.info("💾 Database Connected (WAL Mode Enabled).")
         except sqlite3.Error as e:
             logger.critical(f"❌ Critical Database Connection Failed: {e}")
             sys.exit(1)
 
+    def _connect_readonly(self):
+        """
+        Opens a separate read-only connection ("1 RW + 1 RO" pool).
+        WAL lets this reader run while the writer thread commits, so
+        reads never queue behind a flush. Falls back to the RW handle
+        on first boot (the file may not exist yet until init_tables).
+        """
+        try:
+            self.ro_conn = sqlite3.connect(
+                f"file:{self.db_name}?mode=ro", uri=True,
+                check_same_thread=False, timeout=30.0,
+                cached_statements=256
+            )
+            self.ro_conn.row_factory = sqlite3.Row
+            self.ro_cursor = self.ro_conn.cursor()
+        except sqlite3.Error:
+            self.ro_conn = self.conn
+            self.ro_cursor = self.cursor
+
     def init_tables(self):
         """Creates necessary tables with NEW Smart Settings."""
         try:
@@ -186,6 +285,18 @@ class DatabaseManager:
                     errors INTEGER DEFAULT 0
                 )
             ''')
+
+            # 5. Pending Queue (Durability: survive restarts)
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS pending (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    chat_id INTEGER,
+                    msg_id INTEGER,
+                    is_vip INTEGER DEFAULT 0,
+                    enqueued_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE(chat_id, msg_id)
+                )
+            ''')
             
             # --- 💉 INJECTING NEW SMART DEFAULTS ---
             defaults = {
@@ -206,11 +317,12 @@ class DatabaseManager:
                 "caption_cleaner": "OFF",   # Removes links/@ from captions
             }
             
-            for key, val in defaults.items():
-                self.cursor.execute(
-                    "INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)", 
-                    (key, val)
-                )
+            # One batched statement instead of a round-trip per default,
+            # committed together with the DDL above in a single transaction
+            self.cursor.executemany(
+                "INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)",
+                defaults.items()
+            )
             
             # Ensure Super Admin Access
             self.cursor.execute(
@@ -219,239 +331,320 @@ class DatabaseManager:
             )
             
             self.conn.commit()
+
+            # ⚡ Warm the RAM cache in one shot (bulk load beats N SELECTs)
+            self._warm_caches()
+
+            # The DB file definitely exists now; upgrade the RO handle
+            if self.ro_conn is self.conn:
+                self._connect_readonly()
+
             logger.info("✅ Database Tables & Smart Settings Ready.")
             
         except sqlite3.Error as e:
             logger.critical(f"❌ Table Initialization Error: {e}")
             sys.exit(1)
 
-    # ========================== SETTINGS OPERATIONS ==========================
-
-    def get_setting(self, key: str, default: str = None) -> str:
-        try:
-            self.cursor.execute("SELECT value FROM settings WHERE key=?", (key,))
-            res = self.cursor.fetchone()
-            return res['value'] if res else default
-        except sqlite3.Error:
-            return default
-
-    def set_setting(self, key: str, value: str):
-        try:
-            self.cursor.execute(
-                "REPLACE INTO settings (key, value) VALUES (?, ?)", 
-                (key, str(value))
-            )
-            self.conn.commit()
-        except sqlite3.Error as e:
-            logger.error(f"⚠️ Setting Save Error: {e}")
-
-    # ========================== STICKER OPERATIONS ==========================
+    def _warm_caches(self):
+        """(Re)loads settings, packs and admins into RAM from SQLite.
+        Called at init and again after /restore swaps the DB file."""
+        with self._lock:
+            self._int_cache.clear()
+            # sys.intern: keys loaded from SQLite become the same string
+            # objects as the source-code literals used to look them up, so
+            # cache hits short-circuit on pointer equality inside PyDict
+            self.cursor.execute("SELECT key, value FROM settings")
+            self._settings_cache = {sys.intern(row['key']): row['value'] for row in self.cursor.fetchall()}
 
-    def add_sticker_pack(self, name: str):
-        self.cursor.execute("INSERT OR IGNORE INTO sticker_sets (set_name) VALUES (?)", (name,))
-        self.conn.commit()
-
-    def remove_sticker_pack(self, name: str):
-        self.cursor.execute("DELETE FROM sticker_sets WHERE set_name=?", (name,))
-        self.conn.commit()
-
-    def get_sticker_packs(self) -> List[str]:
-        self.cursor.execute("SELECT set_name FROM sticker_sets")
-        return [row['set_name'] for row in self.cursor.fetchall()]
-
-    # ========================== ADMIN OPERATIONS ==========================
-
-    def add_admin(self, user_id: int, added_by: int):
-        self.cursor.execute(
-            "INSERT OR IGNORE INTO admins (user_id, added_by) VALUES (?, ?)", 
-            (user_id, added_by)
-        )
-        self.conn.commit()
-
-    def remove_admin(self, user_id: int):
-        # 🛡️ SECURITY: Prevent removing Super Admin via Code
-        if user_id == SUPER_ADMIN_ID:
-            logger.warning("⚠️ Attempted to remove Super Admin. Blocked.")
-            return 
-        self.cursor.execute("DELETE FROM admins WHERE user_id=?", (user_id,))
-        self.conn.commit()
-
-    def is_admin(self, user_id: int) -> bool:
-        if user_id == SUPER_ADMIN_ID: return True
-        self.cursor.execute("SELECT 1 FROM admins WHERE user_id=?", (user_id,))
-        return self.cursor.fetchone() is not None
+            self.cursor.execute("SELECT set_name FROM sticker_sets")
+            raw_names = [row['set_name'] for row in self.cursor.fetchall()]
+            # One-time migration: rows saved as full links by older
+            # versions are rewritten to short names, so later DELETEs
+            # (which use the short name) actually match them
+            legacy = [n for n in raw_names if '/' in n]
+            if legacy:
+                self.cursor.executemany(
+                    "INSERT OR IGNORE INTO sticker_sets (set_name) VALUES (?)",
+                    [(n.rsplit('/', 1)[-1],) for n in legacy])
+                self.cursor.executemany(
+                    "DELETE FROM sticker_sets WHERE set_name=?",
+                    [(n,) for n in legacy])
+                self.conn.commit()
+            self._packs_cache = tuple(dict.fromkeys(
+                sys.intern(n.rsplit('/', 1)[-1]) for n in raw_names))
 
-    def get_all_admins(self) -> List[int]:
-        self.cursor.execute("SELECT user_id FROM admins")
-        return [row['user_id'] for row in self.cursor.fetchall()]
+            self.cursor.execute("SELECT user_id FROM admins")
+            self._admin_cache = {row['user_id'] for row in self.cursor.fetchall()}
 
-    # ========================== STATS OPERATIONS ==========================
+    # ========================== BACKGROUND WRITER ==========================
 
-    def update_stats(self, processed=0, stickers=0, errors=0):
-        try:
-            today = datetime.now().date()
-            self.cursor.execute("""
-                INSERT INTO stats (date, processed, stickers_sent, errors)
-                VALUES (?, ?, ?, ?)
-                ON CONFLICT(date) DO UPDATE SET
-                    processed = processed + ?,
-                    stickers_sent = stickers_sent + ?,
-                    errors = errors + ?
-            """, (today, processed, stickers, errors, processed, stickers, errors))
-            self.conn.commit()
-        except sqlite3.Error:
-            pass
+    def _enqueue_write(self, sql: str, params: Tuple = ()):
+        """Hands a mutation to the writer thread; callers return instantly."""
+        self._write_queue.put((sql, params))
 
-    def get_total_stats(self) -> Dict[str, int]:
+    def _writer_loop(self):
+        """
+        Dedicated writer thread 🧵
+        Drains all queued mutations and commits them in ONE batch,
+        so fsync cost is amortized and the event loop never blocks.
+        """
+        while True:
+            batch = [self._write_queue.get()]
+            while True:
+                try:
+                    batch.append(self._write_queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with self._lock:
+                    # Group consecutive identical statements (e.g. a burst
+                    # of pending-queue INSERTs) into one executemany call
+                    i = 0
+                    while i < len(batch):
+                        sql = batch[i][0]
+                        j = i + 1
+                        while j < len(batch) and batch[j][0] == sql:
+                            j += 1
+                        if j - i > 1:
+                            self.cursor.executemany(sql, [p for _, p in batch[i:j]])
+                        else:
+                            self.cursor.execute(sql, batch[i][1])
+                        i = j
+                    self.conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"⚠️ DB Writer Error: {e}")
+            finally:
+                # Unconditional: a failed batch must still unblock join()
+                for _ in batch:
+                    self._write_queue.task_done()
+
+    def drain_writes(self):
+        """Blocks until every mutation queued so far is committed.
+        Call from shutdown (via a thread) — never from the event loop."""
+        self._write_queue.join()
+
+    # ========================== BACKUP SNAPSHOT ==========================
+
+    def create_snapshot(self, dest_path: str) -> str:
+        """
+        Produces a CONSISTENT copy of the live DB via SQLite's backup API.
+        Safe under WAL: writers are only paused a few pages at a time,
+        unlike shipping the raw file mid-write. Runs on a thread.
+        """
+        dst = sqlite3.connect(dest_path)
         try:
-            self.cursor.execute("SELECT SUM(processed), SUM(stickers_sent), SUM(errors) FROM stats")
-            res = self.cursor.fetchone()
-            return {
-                "processed": res[0] or 0,
-                "stickers": res[1] or 0,
-                "errors": res[2] or 0
-            }
-        except:
-            return {"processed": 0, "stickers": 0, "errors": 0}
-
-
+            with self._lock:
+                self.conn.backup(dst, pages=64, sleep=0.001)
+        finally:
+            dst.close()
+        return dest_path
 
-# ========================== SETTINGS OPERATIONS ==========================
+    # ========================== SETTINGS OPERATIONS ==========================
 
     def get_setting(self, key: str, default: str = None) -> str:
         """
-        Retrieves a setting safely. 
-        Returns 'default' if key not found or error occurs.
+        Retrieves a setting from the RAM cache (zero SQL on the hot path).
+        Falls back to SQLite only on a cache miss.
         """
+        val = self._settings_cache.get(key)
+        if val is not None:
+            return val
         try:
-            self.cursor.execute("SELECT value FROM settings WHERE key=?", (key,))
-            res = self.cursor.fetchone()
+            self.ro_cursor.execute(SQL_GET_SETTING, (key,))
+            res = self.ro_cursor.fetchone()
             # Handle both Tuple and Row objects safely
             if res:
-                return res[0] if isinstance(res, tuple) else res['value']
+                val = res[0] if isinstance(res, tuple) else res['value']
+                self._settings_cache[key] = val
+                return val
             return default
         except sqlite3.Error as e:
             # logger.error(f"⚠️ DB Read Error (get_setting): {e}")
             return default
 
-    def set_setting(self, key: str, value: str):
-        """Updates or Inserts a setting immediately."""
+    def is_paused(self) -> bool:
+        """Typed pause flag: one memoized bool instead of fetch+compare."""
+        return self.get_int_setting("is_paused", 0) == 1
+
+    def get_int_setting(self, key: str, default: int = 0) -> int:
+        """
+        Typed read: returns the setting pre-parsed as int.
+        Parsed values are memoized so hot loops (delay, target_channel)
+        skip the str->int conversion entirely; set_setting invalidates.
+        """
+        val = self._int_cache.get(key)
+        if val is not None:
+            return val
+        raw = self.get_setting(key)
         try:
-            self.cursor.execute(
-                "REPLACE INTO settings (key, value) VALUES (?, ?)", 
-                (key, str(value))
-            )
-            self.conn.commit()
-        except sqlite3.Error as e:
-            logger.error(f"⚠️ DB Write Error (set_setting): {e}")
+            val = int(raw)
+        except (TypeError, ValueError):
+            return default
+        self._int_cache[key] = val
+        return val
+
+    def get_settings(self, keys: Tuple[str, ...],
+                     defaults: Dict[str, str] = {}) -> Dict[str, str]:
+        """
+        Bulk read: returns {key: value} for several settings at once.
+        Served entirely from the RAM cache; any misses are fetched in ONE
+        IN-query instead of a SELECT per key.
+        """
+        result = {}
+        missing = []
+        for key in keys:
+            val = self._settings_cache.get(key)
+            if val is not None:
+                result[key] = val
+            else:
+                missing.append(key)
+        if missing:
+            try:
+                placeholders = ",".join("?" * len(missing))
+                self.ro_cursor.execute(
+                    f"SELECT key, value FROM settings WHERE key IN ({placeholders})",
+                    missing
+                )
+                for row in self.ro_cursor.fetchall():
+                    result[row['key']] = row['value']
+                    self._settings_cache[row['key']] = row['value']
+            except sqlite3.Error:
+                pass
+        for key in keys:
+            if key not in result and key in defaults:
+                result[key] = defaults[key]
+        return result
+
+    def set_setting(self, key: str, value: str):
+        """Updates a setting: cache immediately, SQLite via the writer thread."""
+        value = str(value)
+        self._settings_cache[key] = value
+        self._int_cache.pop(key, None)  # typed memo is now stale
+        self._enqueue_write(
+            SQL_SET_SETTING,
+            (key, value)
+        )
 
     # ========================== STICKER OPERATIONS ==========================
 
     def add_sticker_pack(self, name: str):
-        """Adds a sticker pack link to the rotation list."""
-        try:
-            self.cursor.execute("INSERT OR IGNORE INTO sticker_sets (set_name) VALUES (?)", (name,))
-            self.conn.commit()
-        except sqlite3.Error:
-            pass
+        """Adds a sticker pack to the rotation list.
+
+        Links are normalized to their short name at insert time so the
+        hot send path never has to split them again."""
+        name = sys.intern(name.rsplit('/', 1)[-1])
+        if name not in self._packs_cache:
+            self._packs_cache = self._packs_cache + (name,)
+        self._enqueue_write("INSERT OR IGNORE INTO sticker_sets (set_name) VALUES (?)", (name,))
 
     def remove_sticker_pack(self, name: str):
         """Removes a sticker pack from rotation."""
-        try:
-            self.cursor.execute("DELETE FROM sticker_sets WHERE set_name=?", (name,))
-            self.conn.commit()
-        except sqlite3.Error:
-            pass
+        self._packs_cache = tuple(p for p in self._packs_cache if p != name)
+        self._enqueue_write("DELETE FROM sticker_sets WHERE set_name=?", (name,))
 
-    def get_sticker_packs(self) -> List[str]:
-        """Returns a list of all saved sticker pack names/links."""
-        try:
-            self.cursor.execute("SELECT set_name FROM sticker_sets")
-            rows = self.cursor.fetchall()
-            # Handle both Tuple and Row objects
-            if rows and isinstance(rows[0], tuple):
-                return [row[0] for row in rows]
-            return [row['set_name'] for row in rows]
-        except sqlite3.Error:
-            return []
+    def get_sticker_packs(self) -> Tuple[str, ...]:
+        """Returns the cached tuple of saved sticker pack names/links."""
+        return self._packs_cache
 
     # ========================== ADMIN OPERATIONS ==========================
 
     def add_admin(self, user_id: int, added_by: int):
         """Authorizes a new user as an admin."""
-        try:
-            self.cursor.execute(
-                "INSERT OR IGNORE INTO admins (user_id, added_by) VALUES (?, ?)", 
-                (user_id, added_by)
-            )
-            self.conn.commit()
-        except sqlite3.Error as e:
-            logger.error(f"❌ Add Admin Error: {e}")
+        self._admin_cache.add(user_id)
+        self._enqueue_write(
+            "INSERT OR IGNORE INTO admins (user_id, added_by) VALUES (?, ?)",
+            (user_id, added_by)
+        )
 
     def remove_admin(self, user_id: int):
         """Revokes admin access (Super Admin is protected)."""
         if user_id == SUPER_ADMIN_ID:
             logger.warning("🛡️ Security Alert: Attempt to remove Super Admin blocked.")
-            return 
-        try:
-            self.cursor.execute("DELETE FROM admins WHERE user_id=?", (user_id,))
-            self.conn.commit()
-        except sqlite3.Error as e:
-            logger.error(f"❌ Remove Admin Error: {e}")
+            return
+        self._admin_cache.discard(user_id)
+        self._enqueue_write("DELETE FROM admins WHERE user_id=?", (user_id,))
 
     def is_admin(self, user_id: int) -> bool:
-        """Checks if a user is an admin or super admin."""
-        if user_id == SUPER_ADMIN_ID:
-            return True
-        try:
-            self.cursor.execute("SELECT 1 FROM admins WHERE user_id=?", (user_id,))
-            return self.cursor.fetchone() is not None
-        except sqlite3.Error:
-            return False
+        """Checks if a user is an admin or super admin (O(1) set lookup)."""
+        return user_id == SUPER_ADMIN_ID or user_id in self._admin_cache
 
     def get_all_admins(self) -> List[int]:
         """Returns list of all admin IDs."""
-        try:
-            self.cursor.execute("SELECT user_id FROM admins")
-            rows = self.cursor.fetchall()
-            if rows and isinstance(rows[0], tuple):
-                return [row[0] for row in rows]
-            return [row['user_id'] for row in rows]
-        except sqlite3.Error:
-            return []
+        return sorted(self._admin_cache)
 
     # ========================== STATS OPERATIONS ==========================
 
     def update_stats(self, processed=0, stickers=0, errors=0):
         """
-        Updates daily statistics safely using UPSERT logic.
+        Updates daily statistics in RAM only (pure dict increments).
+        stats_flusher batches everything into ONE UPSERT every few seconds,
+        so a burst of posts costs one fsync instead of one per message.
         """
+        with self._lock:
+            self._stat_delta["processed"] += processed
+            self._stat_delta["stickers"] += stickers
+            self._stat_delta["errors"] += errors
+
+    def flush_stats(self):
+        """Snapshots pending counters and ships one UPSERT to the writer."""
+        with self._lock:
+            delta = self._stat_delta
+            if not any(delta.values()):
+                return
+            processed, stickers, errors = delta["processed"], delta["stickers"], delta["errors"]
+            self._stat_delta = {"processed": 0, "stickers": 0, "errors": 0}
+        epoch_day = int(time.time() // 86400)
+        if epoch_day != self._today_epoch_day:
+            self._today_epoch_day = epoch_day
+            self._today_str = str(datetime.now().date())
+        today = self._today_str
+        self._enqueue_write("""
+            INSERT INTO stats (date, processed, stickers_sent, errors)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(date) DO UPDATE SET
+                processed = processed + ?,
+                stickers_sent = stickers_sent + ?,
+                errors = errors + ?
+        """, (today, processed, stickers, errors, processed, stickers, errors))
+
+    # ========================== PENDING QUEUE (PERSISTENCE) ==================
+
+    def add_pending(self, chat_id: int, msg_id: int, is_vip: bool = False):
+        """Durably records an enqueued message (writer thread, non-blocking)."""
+        self._enqueue_write(SQL_ADD_PENDING, (chat_id, msg_id, 1 if is_vip else 0))
+
+    def remove_pending(self, chat_id: int, msg_id: int):
+        """Clears a message from the durable queue once handled (or dropped)."""
+        self._enqueue_write(SQL_DEL_PENDING, (chat_id, msg_id))
+
+    def get_pending(self) -> List[Tuple[int, int, int]]:
+        """Returns surviving (chat_id, msg_id, is_vip) rows in arrival order."""
         try:
-            today = datetime.now().date()
-            self.cursor.execute("""
-                INSERT INTO stats (date, processed, stickers_sent, errors)
-                VALUES (?, ?, ?, ?)
-                ON CONFLICT(date) DO UPDATE SET
-                    processed = processed + ?,
-                    stickers_sent = stickers_sent + ?,
-                    errors = errors + ?
-            """, (today, processed, stickers, errors, processed, stickers, errors))
-            self.conn.commit()
+            with self._lock:
+                self.cursor.execute(
+                    "SELECT chat_id, msg_id, is_vip FROM pending ORDER BY id"
+                )
+                return [(r['chat_id'], r['msg_id'], r['is_vip']) for r in self.cursor.fetchall()]
         except sqlite3.Error:
-            # Stats failures are non-critical, so we ignore to keep bot running
-            pass
+            return []
 
     def get_total_stats(self) -> Dict[str, int]:
         """Aggregates all-time stats."""
         try:
-            self.cursor.execute("SELECT SUM(processed), SUM(stickers_sent), SUM(errors) FROM stats")
-            res = self.cursor.fetchone()
+            self.ro_cursor.execute("SELECT SUM(processed), SUM(stickers_sent), SUM(errors) FROM stats")
+            res = self.ro_cursor.fetchone()
             
             # Safe unpacking
             proc = res[0] if res and res[0] else 0
             stik = res[1] if res and res[1] else 0
             errs = res[2] if res and res[2] else 0
             
+            # Include counters not yet flushed to disk
+            with self._lock:
+                proc += self._stat_delta["processed"]
+                stik += self._stat_delta["stickers"]
+                errs += self._stat_delta["errors"]
+
             return {
                 "processed": proc,
                 "stickers": stik,
@@ -477,22 +670,211 @@ app = Client(
     bot_token=BOT_TOKEN
 )
 
+# 🛡️ Dispatcher-Level Security Gate
+# Pyrogram evaluates filters BEFORE scheduling handler coroutines, so
+# non-admin spam is rejected without ever allocating a handler frame.
+admin_filter = filters.create(
+    lambda _, __, update: bool(update.from_user and db.is_admin(update.from_user.id))
+)
+
 # 2. In-Memory Message Queues (Smart Priority System)
 # ---------------------------------------------------
-# 🔥 VIP Queue: Urgent/Breaking News (Processed FIRST)
-vip_queue = asyncio.Queue()
+# Bounded: past this backlog the producer gets told to slow down
+# instead of RSS growing forever (QUEUE_MAXSIZE env to tune).
+QUEUE_MAXSIZE = max(100, int(os.getenv("QUEUE_MAXSIZE", "5000")))
+
+# 🔥 One priority queue instead of a VIP/Normal pair: workers wait on a
+# single point, so a VIP post arriving while a worker is parked on the
+# normal queue no longer waits behind it. Entries are
+# (priority, seq, QueuedItem); the monotonic seq keeps FIFO order inside
+# each band without comparing Message objects.
+PRIO_VIP = 0
+PRIO_NORMAL = 10
+publish_queue: asyncio.PriorityQueue = asyncio.PriorityQueue(maxsize=QUEUE_MAXSIZE)
+_enqueue_seq = itertools.count()
+
+
+def enqueue_item(item, is_vip: bool):
+    """Adds work to the shared queue. Raises asyncio.QueueFull when saturated."""
+    publish_queue.put_nowait((PRIO_VIP if is_vip else PRIO_NORMAL, next(_enqueue_seq), item))
+
+
+def _vip_backlog() -> int:
+    """VIP entries currently queued. O(n) scan — dashboard display only."""
+    return sum(1 for prio, _, _ in publish_queue._queue if prio == PRIO_VIP)
+
+# 🔁 Retry Policy: FloodWait re-queues the item instead of dropping it
+MAX_SEND_ATTEMPTS = 5
+
+# 🔌 Circuit Breaker: stop pounding a dead/kicked channel.
+# CLOSED = normal, OPEN = short-circuit sends, HALF_OPEN = probe one send.
+class CircuitBreaker:
+    __slots__ = ("failures", "state", "opened_at")
+
+    FAIL_THRESHOLD = 5      # failures within WINDOW to trip
+    WINDOW = 30.0           # seconds
+    COOLDOWN = 60.0         # seconds OPEN before probing
+
+    def __init__(self):
+        self.failures: List[float] = []
+        self.state = "CLOSED"
+        self.opened_at = 0.0
+
+    def allow(self) -> bool:
+        """True if a send may be attempted right now."""
+        if self.state == "OPEN":
+            if time.monotonic() - self.opened_at < self.COOLDOWN:
+                return False
+            self.state = "HALF_OPEN"  # cooldown over: let one probe through
+        return True
+
+    def record_success(self):
+        self.failures.clear()
+        self.state = "CLOSED"
+
+    def record_failure(self):
+        now = time.monotonic()
+        self.failures = [t for t in self.failures if now - t < self.WINDOW]
+        self.failures.append(now)
+        if self.state == "HALF_OPEN" or len(self.failures) >= self.FAIL_THRESHOLD:
+            self.state = "OPEN"
+            self.opened_at = now
+            logger.warning("🔌 Circuit breaker OPEN (too many send failures).")
+
+
+# One breaker per target chat
+_breakers: Dict[int, CircuitBreaker] = {}
+
+# 🔁 Dedup layer: keys of items currently queued or in flight. The same
+# media forwarded twice (or a double-tapped text) publishes once.
+_inflight_keys: set = set()
+
+
+def _dedup_key(message) -> Optional[Any]:
+    """Stable identity for queue dedup: media by file_unique_id, text by hash."""
+    for attr in ("photo", "video", "document", "animation", "audio", "sticker"):
+        media = getattr(message, attr, None)
+        if media is not None:
+            return media.file_unique_id
+    if message.text:
+        return hash(message.text)
+    return None  # Unknown content: never dedup
+
+
+def _release_key(message):
+    """Frees a message's dedup slot once it is published or dropped."""
+    key = _dedup_key(message)
+    if key is not None:
+        _inflight_keys.discard(key)
+
+
+class TokenBucket:
+    """
+    Continuous-refill rate limiter for outbound Telegram calls.
+    Bursts ride the accumulated tokens; sustained load converges on the
+    real global bot limit (30 msg/s) instead of hardcoded sleeps.
+    """
 
-# 📥 Normal Queue: Standard Posts (Processed FIFO)
-msg_queue = asyncio.Queue()
+    def __init__(self, rate: int = 30, per: float = 1.0):
+        self.capacity = float(rate)
+        self.tokens = float(rate)
+        self.fill_rate = rate / per
+        self.updated = time.monotonic()
+
+    async def acquire(self, n: int = 1):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+            self.updated = now
+            if self.tokens >= n:
+                self.tokens -= n
+                return
+            await asyncio.sleep((n - self.tokens) / self.fill_rate)
+
+
+# Shared bucket for everything the bot sends to Telegram
+send_bucket = TokenBucket(rate=30, per=1.0)
+
+# 🚦 One message leaves the bot at a time, whatever WORKER_COUNT says —
+# drain/prep work runs concurrently, only the send itself is serialized.
+send_semaphore = asyncio.Semaphore(1)
+
+# ▶️ Run gate: SET = publishing allowed, CLEAR = paused.
+# Workers await this instead of polling the is_paused setting every 5s,
+# so resume takes effect instantly. Synced from the DB at startup.
+run_event = asyncio.Event()
+
+# ⏳ Per-chat FloodWait backoff: chat_id -> monotonic timestamp before which
+# no send should be attempted for that chat. Keyed by chat so a wait on one
+# target never stalls sends to another if more targets are added later.
+_flood_until: Dict[int, float] = {}
+
+
+class QueuedItem:
+    """A queue entry: the raw message plus its retry counter."""
+    __slots__ = ("message", "attempts")
+
+    def __init__(self, message: Message, attempts: int = 0):
+        self.message = message
+        self.attempts = attempts
 
 # 3. User Input State (RAM)
 # Track karta hai ki kaun user abhi kya set kar raha hai.
 # Example: {12345: "SET_CHANNEL", 67890: "ADD_STICKER"}
-user_input_mode: Dict[int, str] = {}
+class _TTLDict:
+    """
+    Dict with lazy TTL eviction (5 min) and a size cap.
+    A 'stuck' input mode (admin clicked Set Channel, never replied)
+    expires on its own instead of leaking forever.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[int, Tuple[str, float]]" = OrderedDict()
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        value, stored_at = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._data[key]
+            return default
+        return value
+
+    def __contains__(self, key) -> bool:
+        return self.get(key) is not None
+
+    def __setitem__(self, key, value):
+        self._data[key] = (value, time.monotonic())
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __delitem__(self, key):
+        del self._data[key]
+
+    def pop(self, key, default=None):
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return default
+        value, stored_at = entry
+        if time.monotonic() - stored_at > self.ttl:
+            return default
+        return value
+
+
+user_input_mode = _TTLDict()
+
+# 📮 Ack throttle per admin: (msg_id, monotonic_ts) of the last queue ack.
+# Bursts EDIT the previous ack instead of minting a new message, and acks
+# under 5s apart are skipped entirely — outbound quota goes to publishing.
+_last_ack: Dict[int, Tuple[int, float]] = {}
 
 # 4. System Start Time (For Uptime Calculation)
-# Used in the Dashboard to show how long the bot has been running.
-start_time = time.time()
+# Monotonic: immune to NTP jumps / clock skew (no negative uptime).
+start_time = time.monotonic()
 
 # 5. Smart Album Tracking (For Sticker Logic)
 # Stores the 'media_group_id' of the last processed message.
@@ -507,54 +889,61 @@ last_processed_album_id = None
 # ==============================================================================
 
 def get_uptime() -> str:
-    """
-    Returns a human-readable uptime string (e.g., '2d 4h 30m 15s').
-    Includes safety check for start_time variable.
-    """
-    try:
-        # Calculate total seconds
-        # 'start_time' must be defined in Global State
-        if 'start_time' not in globals():
-            return "0d 0h 0m 0s"
-            
-        seconds = int(time.time() - start_time)
-        
-        # Calculate Days, Hours, Minutes, Seconds
-        m, s = divmod(seconds, 60)
-        h, m = divmod(m, 60)
-        d, h = divmod(h, 24)
-        
-        # Return formatted string
-        return f"{d}d {h}h {m}m {s}s"
-    except Exception as e:
-        logger.error(f"⚠️ Uptime Error: {e}")
-        return "0d 0h 0m 0s"
+    """Returns a human-readable uptime string (e.g., '2d 4h 30m 15s')."""
+    seconds = int(time.monotonic() - start_time)
+
+    # Calculate Days, Hours, Minutes, Seconds
+    m, s = divmod(seconds, 60)
+    h, m = divmod(m, 60)
+    d, h = divmod(h, 24)
+
+    return f"{d}d {h}h {m}m {s}s"
         
 # ==============================================================================
 #                           GUI KEYBOARD FACTORIES
 # ==============================================================================
 
+# ⚡ Dashboard keyboard cache: the markup is rebuilt only when the state
+# it displays actually changes (key comparison beats invalidation hooks).
+_dashboard_cache: Optional[InlineKeyboardMarkup] = None
+_dashboard_key: Optional[tuple] = None
+
+
 def get_main_menu() -> InlineKeyboardMarkup:
     """
     Generates the Main Dashboard with live status.
     Reflects the new 'Smart Mode' and 'Sticker Status'.
+    Reuses the cached markup when nothing visible changed.
     """
+    global _dashboard_cache, _dashboard_key
     try:
-        # 1. Fetch live state from DB
-        is_paused = db.get_setting("is_paused", "0") == "1"
-        target_ch = db.get_setting("target_channel", "0")
-        delay = db.get_setting("delay", "30")
-        
+        # 1. Fetch live state (one bulk read instead of 6 lookups)
+        s = db.get_settings(
+            ("is_paused", "target_channel", "delay", "mode", "sticker_state", "footer"),
+            defaults={"is_paused": "0", "target_channel": "0", "delay": "30",
+                      "mode": "copy", "sticker_state": "ON", "footer": "NONE"}
+        )
+        is_paused = db.is_paused()
+        target_ch = s["target_channel"]
+        delay = s["delay"]
+
         # Mode Logic: Forward (Tag) vs Copy (No Tag)
-        mode = db.get_setting("mode", "copy") 
+        mode = s["mode"]
         mode_display = "⏩ Forward (Tag)" if mode == "forward" else "©️ Copy (No Tag)"
-        
+
         # Sticker Status
-        st_state = db.get_setting("sticker_state", "ON")
+        st_state = s["sticker_state"]
         st_icon = "🟢" if st_state == "ON" else "🔴"
-        
-        footer_val = db.get_setting("footer", "NONE")
-        footer_status = "✅ ON" if footer_val != "NONE" else "❌ OFF"
+
+        footer_status = "✅ ON" if s["footer"] != "NONE" else "❌ OFF"
+
+        # Queue size enters the key as a log2 bucket (0, 1, 2-3, 4-7, ...)
+        # so a busy queue doesn't bust the cache on every single enqueue.
+        # The exact live count is always one tap away via "view_queue".
+        cache_key = (is_paused, target_ch, delay, mode, st_state, footer_status,
+                     publish_queue.qsize().bit_length())
+        if _dashboard_cache is not None and cache_key == _dashboard_key:
+            return _dashboard_cache
 
         # 2. Logic for Buttons
         status_text = "🔴 SYSTEM PAUSED" if is_paused else "🟢 SYSTEM RUNNING"
@@ -580,7 +969,7 @@ def get_main_menu() -> InlineKeyboardMarkup:
                 InlineKeyboardButton(f"🎭 Stickers: {st_state} {st_icon}", callback_data="menu_stickers")
             ],
             [
-                InlineKeyboardButton(f"📥 Queue: {msg_queue.qsize()}", callback_data="view_queue"),
+                InlineKeyboardButton(f"📥 Queue: {publish_queue.qsize()}", callback_data="view_queue"),
                 InlineKeyboardButton("📊 Analytics", callback_data="view_stats")
             ],
             [
@@ -588,20 +977,41 @@ def get_main_menu() -> InlineKeyboardMarkup:
                 InlineKeyboardButton("🔄 Refresh Dashboard", callback_data="refresh_home")
             ]
         ]
-        return InlineKeyboardMarkup(keyboard)
-        
+        _dashboard_cache = InlineKeyboardMarkup(keyboard)
+        _dashboard_key = cache_key
+        return _dashboard_cache
+
     except Exception as e:
         logger.error(f"❌ Menu Generation Error: {e}")
         return InlineKeyboardMarkup([[InlineKeyboardButton("🔄 Error! Click to Refresh", callback_data="refresh_home")]])
 
+def _truncate_pack_name(pack: str) -> str:
+    """Short display name for a pack (max 15 chars)."""
+    return pack if len(pack) <= 15 else pack[:12] + "..."
+
+
+# Sticker menu cache: keyed by everything it renders. Pack tuples are
+# shared immutable objects, so the key build is allocation-free.
+_sticker_menu_cache: Optional[InlineKeyboardMarkup] = None
+_sticker_menu_key: Optional[tuple] = None
+
+
 def get_sticker_menu() -> InlineKeyboardMarkup:
     """
     Advanced Sticker Control Panel.
     Allows toggling ON/OFF and switching between Random/Single modes.
+    Reuses the previous markup while state and packs are unchanged.
     """
-    # Fetch Settings
-    state = db.get_setting("sticker_state", "ON")     # ON / OFF
-    mode = db.get_setting("sticker_mode", "RANDOM")   # RANDOM / SINGLE
+    global _sticker_menu_cache, _sticker_menu_key
+    # Fetch Settings (one bulk read)
+    s = db.get_settings(("sticker_state", "sticker_mode"),
+                        defaults={"sticker_state": "ON", "sticker_mode": "RANDOM"})
+    state = s["sticker_state"]   # ON / OFF
+    mode = s["sticker_mode"]     # RANDOM / SINGLE
+
+    cache_key = (state, mode, db.get_sticker_packs())
+    if _sticker_menu_cache is not None and cache_key == _sticker_menu_key:
+        return _sticker_menu_cache
     
     # State Button Logic
     btn_state_text = "🔴 Turn OFF" if state == "ON" else "🟢 Turn ON"
@@ -626,28 +1036,35 @@ def get_sticker_menu() -> InlineKeyboardMarkup:
     packs = db.get_sticker_packs()
     if packs:
         btns.append([InlineKeyboardButton(f"--- 📦 Manage {len(packs)} Packs ---", callback_data="noop")])
-        for i, pack in enumerate(packs):
-            if i >= 5: # Limit list to 5 to keep UI clean
-                btns.append([InlineKeyboardButton(f"➕ And {len(packs)-5} more...", callback_data="noop")])
-                break
-            
-            # Smart Name Truncation
-            name = pack.split('/')[-1]
-            if len(name) > 15: name = name[:12] + "..."
-            
-            btns.append([
-                InlineKeyboardButton(f"📦 {name}", callback_data="noop"),
+        # Slice + comprehension: no per-row limit branch (UI shows max 5)
+        btns.extend(
+            [
+                InlineKeyboardButton(f"📦 {_truncate_pack_name(pack)}", callback_data="noop"),
                 InlineKeyboardButton("🗑 Del", callback_data=f"del_pack_{pack}")
-            ])
+            ]
+            for pack in packs[:5]
+        )
+        if len(packs) > 5:
+            btns.append([InlineKeyboardButton(f"➕ And {len(packs)-5} more...", callback_data="noop")])
             
     btns.append([InlineKeyboardButton("🔙 Back to Dashboard", callback_data="back_home")])
-    return InlineKeyboardMarkup(btns)
+    _sticker_menu_cache = InlineKeyboardMarkup(btns)
+    _sticker_menu_key = cache_key
+    return _sticker_menu_cache
+
+# Footer menu has exactly two shapes (footer set / not set) — cache both
+_footer_menu_cache: Dict[bool, InlineKeyboardMarkup] = {}
+
 
 def get_footer_menu() -> InlineKeyboardMarkup:
     """Sub-menu for Footer Management."""
     current_footer = db.get_setting("footer", "NONE")
     has_footer = current_footer != "NONE"
-    
+
+    cached = _footer_menu_cache.get(has_footer)
+    if cached is not None:
+        return cached
+
     btns = []
     if has_footer:
         btns.append([InlineKeyboardButton("👀 View Current Footer", callback_data="view_footer_text")])
@@ -655,8 +1072,10 @@ def get_footer_menu() -> InlineKeyboardMarkup:
     
     btns.append([InlineKeyboardButton("✏️ Set/Update Footer", callback_data="ask_footer")])
     btns.append([InlineKeyboardButton("🔙 Back to Home", callback_data="back_home")])
-    
-    return InlineKeyboardMarkup(btns)
+
+    markup = InlineKeyboardMarkup(btns)
+    _footer_menu_cache[has_footer] = markup
+    return markup
 
 def get_upload_success_kb() -> InlineKeyboardMarkup:
     """
@@ -668,13 +1087,19 @@ def get_upload_success_kb() -> InlineKeyboardMarkup:
         [InlineKeyboardButton("🔙 Return to Main Menu", callback_data="refresh_home")]
     ])
 
+# These two keyboards have no live state — build them ONCE at import time
+# (Pyrogram serializes per send, never mutates them)
+_CANCEL_KB = InlineKeyboardMarkup([[InlineKeyboardButton("❌ Cancel Operation", callback_data="cancel_input")]])
+_BACK_HOME_KB = InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back to Dashboard", callback_data="back_home")]])
+
+
 def get_cancel_kb() -> InlineKeyboardMarkup:
     """Standard Cancel Button."""
-    return InlineKeyboardMarkup([[InlineKeyboardButton("❌ Cancel Operation", callback_data="cancel_input")]])
+    return _CANCEL_KB
 
 def get_back_home_kb() -> InlineKeyboardMarkup:
     """Standard Back Button."""
-    return InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back to Dashboard", callback_data="back_home")]])
+    return _BACK_HOME_KB
 
 
 
@@ -688,6 +1113,13 @@ def get_back_home_kb() -> InlineKeyboardMarkup:
 # ==============================================================================
 #                           AUTO-BACKUP SYSTEM (With Storage Cleaner)
 # ==============================================================================
+async def stats_flusher():
+    """Flushes batched stats counters to SQLite every 5 seconds."""
+    while True:
+        await asyncio.sleep(5)
+        db.flush_stats()
+
+
 async def auto_backup_task(app):
     """
     1. Sends Database Backup to Super Admin every 1 Hour.
@@ -708,12 +1140,21 @@ async def auto_backup_task(app):
                     f"ℹ️ **Restore:** Reply to this file with `/restore` command.\n"
                     f"🧹 **Status:** Cache Cleared."
                 )
-                
-                await app.send_document(
-                    chat_id=SUPER_ADMIN_ID,
-                    document=DB_NAME,
-                    caption=caption
+
+                # 📸 Consistent snapshot (never ship the live WAL-mode file)
+                snapshot = await asyncio.to_thread(
+                    db.create_snapshot, "/tmp/backup_snapshot.db"
                 )
+                try:
+                    await app.send_document(
+                        chat_id=SUPER_ADMIN_ID,
+                        document=snapshot,
+                        caption=caption,
+                        file_name=DB_NAME
+                    )
+                finally:
+                    if os.path.exists(snapshot):
+                        os.remove(snapshot)
                 logger.info("✅ Database Backup sent to Super Admin.")
             else:
                 logger.warning("⚠️ Database file not found or empty!")
@@ -754,6 +1195,136 @@ async def auto_backup_task(app):
 from pyrogram.raw import functions, types
 import random
 
+# 🎭 Sticker Document Cache
+# short_name -> (tuple_of_documents, content_hash). The refresher task
+# re-validates entries and skips reassignment when the pack is unchanged,
+# so steady-state refreshes allocate nothing.
+class _PackCache:
+    """
+    Bounded LRU + TTL cache (hand-rolled, no extra deps).
+    Caps RAM regardless of pack count; stale entries expire after an
+    hour so a pack deleted elsewhere can never linger forever.
+    """
+
+    def __init__(self, maxsize: int = 64, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[tuple, int, float]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Tuple[tuple, int]]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        docs, content_hash, stored_at = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)  # mark as recently used
+        return (docs, content_hash)
+
+    def __setitem__(self, key: str, value: Tuple[tuple, int]):
+        self._data[key] = (value[0], value[1], time.monotonic())
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)  # evict least-recently used
+
+    def pop(self, key: str, default=None):
+        entry = self._data.pop(key, default)
+        return entry
+
+    def values(self):
+        now = time.monotonic()
+        return [(d, h) for d, h, t in self._data.values() if now - t <= self.ttl]
+
+
+_sticker_cache = _PackCache()
+
+# 📡 Resolved InputPeer cache: resolve_peer can cost an RPC; the target
+# channel changes ~never, so resolve once and reuse. Invalidated when the
+# admin sets a new target channel.
+_peer_cache: Dict[int, Any] = {}
+
+
+async def _get_peer(client, chat_id: int):
+    peer = _peer_cache.get(chat_id)
+    if peer is None:
+        peer = await client.resolve_peer(chat_id)
+        _peer_cache[chat_id] = peer
+    return peer
+
+# ⚡ Flat view over every cached document: RANDOM mode picks from this one
+# tuple instead of fetching a pack per message. Rebuilt only when a pack
+# actually changes (hash mismatch) or is removed.
+_sticker_flat: tuple = ()
+
+
+def _rebuild_sticker_flat():
+    global _sticker_flat
+    _sticker_flat = tuple(
+        doc for docs, _ in _sticker_cache.values() for doc in docs
+    )
+
+
+async def _fetch_pack_documents(client, short_name: str) -> tuple:
+    """Fetches a sticker set via Raw API and caches it as an immutable tuple."""
+    pack_data = await client.invoke(
+        functions.messages.GetStickerSet(
+            stickerset=types.InputStickerSetShortName(short_name=short_name),
+            hash=0
+        )
+    )
+    # SoA: keep only the (id, access_hash, file_reference) triples the
+    # send path needs, not the full raw document objects (memory win)
+    if pack_data and pack_data.documents:
+        docs = tuple((d.id, d.access_hash, d.file_reference) for d in pack_data.documents)
+    else:
+        docs = ()
+    content_hash = hash(tuple(t[0] for t in docs))
+    cached = _sticker_cache.get(short_name)
+    if cached is None or cached[1] != content_hash:
+        _sticker_cache[short_name] = (docs, content_hash)
+        _rebuild_sticker_flat()
+    return docs
+
+
+# ⏲️ Debounced prefetch: rapid pack adds coalesce into one fetch burst
+# 2 seconds later instead of hitting getStickerSet once per add.
+_prefetch_names: set = set()
+_prefetch_handle: Optional[asyncio.TimerHandle] = None
+
+
+def _schedule_pack_prefetch(client, short_name: str):
+    global _prefetch_handle
+    _prefetch_names.add(short_name)
+    if _prefetch_handle is not None:
+        _prefetch_handle.cancel()
+
+    def _fire():
+        global _prefetch_handle
+        _prefetch_handle = None
+        pending = tuple(_prefetch_names)
+        _prefetch_names.clear()
+        for name in pending:
+            asyncio.create_task(_fetch_pack_documents(client, name))
+
+    _prefetch_handle = asyncio.get_event_loop().call_later(2.0, _fire)
+
+
+async def sticker_cache_refresher(client):
+    """
+    Background task: preloads every known pack at startup (so the very
+    first publish never pays a GetStickerSet RPC), then re-validates the
+    set every 5 minutes.
+    """
+    while True:
+        for pack in db.get_sticker_packs():
+            try:
+                await _fetch_pack_documents(client, pack)
+            except Exception:
+                continue  # Bad/removed pack; worker path handles misses
+        await asyncio.sleep(300)
+
+
 async def send_smart_sticker(client, chat_id):
     """
     Decides whether to send a Fixed Sticker or a Random one from packs.
@@ -776,7 +1347,6 @@ async def send_smart_sticker(client, chat_id):
                 # Direct send via Pyrogram (Faster for single file_id)
                 await client.send_sticker(chat_id, file_id)
                 db.update_stats(stickers=1)
-                await asyncio.sleep(1.0) # Thoda gap
                 return
             else:
                 # Agar Single Mode hai par ID nahi hai, to Random par fall back karo
@@ -789,33 +1359,29 @@ async def send_smart_sticker(client, chat_id):
         if not packs: 
             return # Koi pack nahi hai to kuch mat karo
 
-        # Random Pack Choose karo
-        pack_name = random.choice(packs)
-        
-        # Link se short name nikalo (e.g., t.me/addstickers/MyPack -> MyPack)
-        short_name = pack_name.split('/')[-1]
-
-        # Raw API se Stickers Mangwao (Ye error nahi dega)
-        pack_data = await client.invoke(
-            functions.messages.GetStickerSet(
-                stickerset=types.InputStickerSetShortName(short_name=short_name),
-                hash=0
-            )
-        )
+        # ⚡ Flat pick: ONE random.choice over every cached sticker
+        if _sticker_flat:
+            sticker = random.choice(_sticker_flat)
+        else:
+            # Cold cache: fetch just one pack, not all of them
+            short_name = random.choice(packs)
+            documents = await _fetch_pack_documents(client, short_name)
+            if not documents:
+                return
+            sticker = random.choice(documents)
+
+        if sticker:
+            s_id, s_hash, s_ref = sticker  # cached triple, no attr chain
 
-        # Random Sticker Choose karke Bhejo
-        if pack_data and pack_data.documents:
-            sticker = random.choice(pack_data.documents)
-            
             # Raw method se bhejo (SendMedia) - Most Robust Way
             await client.invoke(
                 functions.messages.SendMedia(
-                    peer=await client.resolve_peer(chat_id),
+                    peer=await _get_peer(client, chat_id),
                     media=types.InputMediaDocument(
                         id=types.InputDocument(
-                            id=sticker.id,
-                            access_hash=sticker.access_hash,
-                            file_reference=sticker.file_reference
+                            id=s_id,
+                            access_hash=s_hash,
+                            file_reference=s_ref
                         )
                     ),
                     message="",
@@ -824,8 +1390,7 @@ async def send_smart_sticker(client, chat_id):
             )
             
             db.update_stats(stickers=1)
-            logger.info(f"🤡 Sticker sent ({mode} mode): {short_name}")
-            await asyncio.sleep(1.0) # Thoda gap taaki caption mix na ho
+            logger.info("🤡 Sticker sent (%s mode).", mode)
 
     except Exception as e:
         # Agar sticker fail ho, to ignore karo aur main post bhejo
@@ -838,7 +1403,69 @@ async def send_smart_sticker(client, chat_id):
 # ==============================================================================
 import re # Caption cleaning ke liye
 
-async def worker_engine():
+# ⚡ Precompiled once at import: re.sub with a string pattern would
+# recompile on every single message in the worker loop.
+_URL_RE = re.compile(r'https?://\S+|www\.\S+|http\S+')
+_MENTION_RE = re.compile(r'@\w+')
+# Pulls the short name out of a t.me/addstickers/<name> link in one scan
+_STICKER_LINK_RE = re.compile(r'addstickers/(\S+)')
+
+
+def _media_kind(message: Message) -> Optional[str]:
+    """Returns 'photo'/'video' for album-groupable media, else None."""
+    if message.photo:
+        return "photo"
+    if message.video:
+        return "video"
+    return None
+
+
+def _drain_same_kind(src_q: asyncio.Queue, kind: str, prio: int, max_extra: int = 9) -> List[QueuedItem]:
+    """Non-blockingly pulls consecutive queued items of the same media
+    kind AND priority band so they can ship as ONE send_media_group
+    call. Matching the band keeps a VIP item out of a normal batch
+    (and vice versa), so retry re-queues preserve each item's priority.
+    Peeks at the heap head (private access, but the only way to drain
+    without re-ordering on mismatch)."""
+    extras: List[QueuedItem] = []
+    while (len(extras) < max_extra and src_q.qsize()
+           and src_q._queue[0][0] == prio
+           and _media_kind(src_q._queue[0][2].message) == kind):
+        extras.append(src_q.get_nowait()[2])
+    return extras
+
+
+# Precomputed footer suffix: rebuilt only when the footer value changes,
+# so the per-message merge is one plain concat with no branch/f-string.
+_footer_suffix = ""
+_footer_suffix_src: Optional[str] = None
+
+
+def _get_footer_suffix(footer: str) -> str:
+    global _footer_suffix, _footer_suffix_src
+    if footer is not _footer_suffix_src and footer != _footer_suffix_src:
+        _footer_suffix_src = footer
+        _footer_suffix = f"\n\n{footer}" if footer and footer != "NONE" else ""
+    return _footer_suffix
+
+
+def apply_caption_rules(message: Message, footer: str, cleaner_mode: str) -> str:
+    """Cleans the text (links/@mentions) and merges the footer."""
+    original_text = message.text or message.caption or ""
+
+    # 🧹 Auto-Cleaner Logic (Regex)
+    if cleaner_mode == "ON" and original_text:
+        original_text = _URL_RE.sub('', original_text)
+        original_text = _MENTION_RE.sub('', original_text)
+        original_text = original_text.strip()
+
+    # Merge Footer (suffix precomputed; empty when footer is unset)
+    suffix = _get_footer_suffix(footer)
+    if not original_text:
+        return footer if suffix else original_text
+    return original_text + suffix
+
+async def worker_engine(worker_id: int = 0):
     """
     The Brain of the System 🧠
     Handles:
@@ -846,42 +1473,52 @@ async def worker_engine():
     2. Smart Album Detection (No Sticker Spam)
     3. Caption Cleaning (Regex)
     4. Dynamic Publishing (Copy vs Forward)
+
+    WORKER_COUNT instances share the same queues; album tracking lives
+    in module state so sticker interleaving stays deterministic.
     """
-    logger.info("🚀 Enterprise Worker Engine Started...")
-    
-    # Track last album to prevent sticker spam
-    # Hum local variable use kar rahe hain taaki global state clutter na ho
-    last_processed_album_id = None 
+    global last_processed_album_id
+    logger.info("🚀 Enterprise Worker Engine #%d Started...", worker_id)
     
     while True:
         # -------------------------------------------------------
         # [STEP 1] PRIORITY QUEUE FETCHING
         # -------------------------------------------------------
-        # Pehle check karo VIP queue me kuch hai?
-        if not vip_queue.empty():
-            message = await vip_queue.get()
+        # Single wait point: the heap hands VIP entries out first
+        prio, _, item = await publish_queue.get()
+        is_vip = prio == PRIO_VIP
+        if is_vip:
             logger.info("⚡ Processing VIP Message...")
-            is_vip = True
-        else:
-            # Agar VIP khali hai, to Normal queue dekho
-            message = await msg_queue.get()
-            is_vip = False
-        
+
+        message = item.message
+        src_q = publish_queue
+        extras: List[QueuedItem] = []  # Same-type media drained for one album send
+
         try:
-            # 2. Check Pause State (Loop until resumed)
+            # 2. Check Pause State (event wait — wakes instantly on resume)
             # Super Admin can pause the bot anytime
-            while db.get_setting("is_paused") == "1":
-                await asyncio.sleep(5) 
+            await run_event.wait()
             
             # 3. Check Target Channel
-            target_raw = db.get_setting("target_channel", "0")
-            if target_raw == "0":
+            target_id = db.get_int_setting("target_channel", 0)
+            if target_id == 0:
                 logger.warning("⚠️ Target channel not set. Dropping message.")
-                if is_vip: vip_queue.task_done()
-                else: msg_queue.task_done()
-                continue
-            
-            target_id = int(target_raw)
+                _release_key(message)
+                continue  # finally-block marks the task done
+
+            # Respect an active FloodWait window for THIS chat only
+            backoff = _flood_until.get(target_id, 0.0) - time.monotonic()
+            if backoff > 0:
+                await asyncio.sleep(backoff)
+
+            # 🔌 Dead channel? Drop fast instead of send->error->repeat
+            breaker = _breakers.setdefault(target_id, CircuitBreaker())
+            if not breaker.allow():
+                logger.warning("⛔ Circuit OPEN for %d — dropping message.", target_id)
+                db.update_stats(errors=1)
+                db.remove_pending(message.chat.id, message.id)
+                _release_key(message)
+                continue  # finally-block marks the task done
 
             # -------------------------------------------------------
             # [STEP 4] SMART ALBUM & STICKER LOGIC 🧠
@@ -903,290 +1540,475 @@ async def worker_engine():
             else:
                 last_processed_album_id = None # Not an album, reset
 
-            # Call the Helper Function we made in Part 6
-            if should_send_sticker:
-                await send_smart_sticker(app, target_id)
-
             # -------------------------------------------------------
             # [STEP 5] CONTENT PREPARATION (Caption Cleaner)
             # -------------------------------------------------------
             mode = db.get_setting("mode", "copy")
             footer = db.get_setting("footer", "NONE")
             cleaner_mode = db.get_setting("caption_cleaner", "OFF")
-            
-            # Extract Text
-            original_text = message.text or message.caption or ""
-            
-            # 🧹 Auto-Cleaner Logic (Regex)
-            if cleaner_mode == "ON" and original_text:
-                # Remove links (http/https/www)
-                original_text = re.sub(r'http\S+', '', original_text)
-                # Remove usernames (@username)
-                original_text = re.sub(r'@\w+', '', original_text)
-                # Remove extra spaces
-                original_text = original_text.strip()
-
-            # Merge Footer
-            if footer != "NONE" and footer:
-                if original_text:
-                    final_text = f"{original_text}\n\n{footer}"
-                else:
-                    final_text = footer
-            else:
-                final_text = original_text
+
+            final_text = apply_caption_rules(message, footer, cleaner_mode)
 
             # -------------------------------------------------------
-            # [STEP 6] PUBLISHING
+            # [STEP 6] PUBLISHING (Album Batching 🚀)
             # -------------------------------------------------------
             if mode == "forward":
                 # Forward with Tag
-                await message.forward(target_id)
-            
+                publish_coro = message.forward(target_id)
+
             else:
-                # Copy (No Tag) - This is what you called "Forward without tag"
-                # .copy() method automatically handles Photo, Video, Document, Text
-                await message.copy(
-                    chat_id=target_id,
-                    caption=final_text
-                )
+                # 🚀 BATCHING: If the next queued items are the same media
+                # type, ship up to 10 in ONE send_media_group call instead
+                # of 10 separate copies (fewer RPCs, fewer FloodWaits).
+                kind = _media_kind(message)
+                if kind:
+                    extras = _drain_same_kind(src_q, kind, prio)
+
+                if extras:
+                    media_cls = InputMediaPhoto if kind == "photo" else InputMediaVideo
+                    media = []
+                    for m in [message] + [it.message for it in extras]:
+                        fid = m.photo.file_id if kind == "photo" else m.video.file_id
+                        media.append(media_cls(fid, caption=apply_caption_rules(m, footer, cleaner_mode)))
+                    publish_coro = app.send_media_group(target_id, media)
+                else:
+                    # Copy (No Tag) - This is what you called "Forward without tag"
+                    # .copy() method automatically handles Photo, Video, Document, Text
+                    publish_coro = message.copy(
+                        chat_id=target_id,
+                        caption=final_text
+                    )
+
+            # ⚡ Sticker + publish fly CONCURRENTLY (pipelined MTProto
+            # requests, submission order preserved) instead of sticker ->
+            # 1s gap -> publish. send_smart_sticker swallows its own
+            # errors, so only publish failures propagate to the retry paths.
+            # Cheapest check first: when stickers are globally OFF, don't
+            # even create the sticker coroutine/gather pair
+            if should_send_sticker and db.get_setting("sticker_state", "ON") == "OFF":
+                should_send_sticker = False
+
+            async with send_semaphore:
+                # One token per outbound call (sticker counts as its own)
+                await send_bucket.acquire(2 if should_send_sticker else 1)
+                if should_send_sticker:
+                    await asyncio.gather(send_smart_sticker(app, target_id), publish_coro)
+                else:
+                    await publish_coro
 
             # 7. Success & Stats
-            db.update_stats(processed=1)
+            breaker.record_success()
+            db.update_stats(processed=1 + len(extras))
+            for m in [message] + [it.message for it in extras]:
+                db.remove_pending(m.chat.id, m.id)
+                _release_key(m)
             
             # Log Queue Size
-            q_total = msg_queue.qsize() + vip_queue.qsize()
-            logger.info(f"✅ Published. Queue Remaining: {q_total}")
+            logger.info("✅ Published. Queue Remaining: %d", publish_queue.qsize())
             
             # 8. Dynamic Delay
-            delay = int(db.get_setting("delay", "30"))
+            delay = db.get_int_setting("delay", 30)
             await asyncio.sleep(delay)
 
         except FloodWait as e:
-            logger.warning(f"⏳ FloodWait: Sleeping for {e.value} seconds.")
-            await asyncio.sleep(e.value)
-            # Retry logic could be added here, but for now we skip to avoid loops
+            logger.warning("⏳ FloodWait: Sleeping for %s seconds.", e.value)
+            _flood_until[target_id] = time.monotonic() + e.value
+            await asyncio.sleep(e.value + random.uniform(0, 1))
+            # 🔁 Put the work back instead of dropping it (bounded retries)
+            for it in [item] + extras:
+                it.attempts += 1
+                if it.attempts < MAX_SEND_ATTEMPTS and not src_q.full():
+                    # put_nowait: the consumer must never block on its own
+                    # full queue (deadlock); a full queue drops instead
+                    enqueue_item(it, is_vip)
+                else:
+                    logger.error("🗑 Dropping message after repeated FloodWait retries.")
+                    db.update_stats(errors=1)
+                    db.remove_pending(it.message.chat.id, it.message.id)
+                    _release_key(it.message)
             
         except RPCError as e:
-            logger.error(f"❌ Telegram API Error: {e}")
-            db.update_stats(errors=1)
+            logger.error("❌ Telegram API Error: %s", e)
+            breaker.record_failure()
+            # 🔁 Transient API errors get the same bounded retry treatment,
+            # with exponential backoff + full jitter before re-queueing
+            for it in [item] + extras:
+                it.attempts += 1
+                if it.attempts < MAX_SEND_ATTEMPTS and not src_q.full():
+                    enqueue_item(it, is_vip)
+                else:
+                    logger.error("🗑 Dropping message after repeated API errors.")
+                    db.update_stats(errors=1)
+                    db.remove_pending(it.message.chat.id, it.message.id)
+                    _release_key(it.message)
+            if item.attempts < MAX_SEND_ATTEMPTS:
+                await asyncio.sleep(min(60, 2 ** item.attempts) + random.random())
             
         except Exception as e:
-            logger.critical(f"❌ Worker Error: {e}")
-            traceback.print_exc()
+            # .exception routes the traceback through the queued handlers
+            # instead of a second synchronous stderr write
+            logger.exception("❌ Worker Error: %s", e)
             db.update_stats(errors=1)
+            # Non-RPC failures are terminal (no retry): drop the durable
+            # rows and free the dedup keys, or identical content would be
+            # rejected as "duplicate" until restart
+            for it in [item] + extras:
+                db.remove_pending(it.message.chat.id, it.message.id)
+                _release_key(it.message)
             
         finally:
-            # Task Done Mark karna zaroori hai
-            if is_vip:
-                vip_queue.task_done()
-            else:
-                msg_queue.task_done()
+            # Task Done Mark karna zaroori hai (batched extras included)
+            for _ in extras:
+                publish_queue.task_done()
+            publish_queue.task_done()
 
 # ==============================================================================
 #                           CALLBACK HANDLERS (GUI ENGINE)
 # ==============================================================================
 
-@app.on_callback_query()
-async def callback_router(client: Client, cb: CallbackQuery):
+def callback_handler(pattern: str):
     """
-    Handles all Button Interactions.
-    Includes Smart Toggles for Stickers & Advanced Navigation.
+    Registers a small per-prefix callback handler.
+    Pyrogram compiles the regex once and dispatches straight to the
+    matching handler, so each button press runs only its own branch
+    (no mega if/elif scan) with a shared error guard.
     """
-    user_id = cb.from_user.id
-    data = cb.data
-
-    # 1. Security Barrier 🛡️ (Admins Only)
-    if not db.is_admin(user_id):
-        await cb.answer("🚫 ACCESS DENIED: Authorized Personnel Only.", show_alert=True)
-        return
-
-    try:
-        # --- 🏠 DASHBOARD & NAVIGATION ---
-        if data in ["back_home", "refresh_home"]:
-            if user_id in user_input_mode: del user_input_mode[user_id]
-            
-            paused = db.get_setting("is_paused") == "1"
-            status_icon = "🔴 SYSTEM PAUSED" if paused else "🟢 SYSTEM ONLINE"
-            
-            # Premium Dashboard Text
-            dash_text = (
-                f"🎛 **ENTERPRISE CONTROL HUB**\n"
-                f"━━━━━━━━━━━━━━━━━━\n"
-                f"👋 **Welcome:** `{cb.from_user.first_name}`\n"
-                f"🛡️ **Access Level:** `{'Super Admin' if user_id == SUPER_ADMIN_ID else 'Admin'}`\n"
-                f"━━━━━━━━━━━━━━━━━━\n"
-                f"📊 **LIVE TELEMETRY**\n"
-                f"➤ **Status:** `{status_icon}`\n"
-                f"➤ **Uptime:** `{get_uptime()}`\n"
-                f"➤ **Queue Depth:** `{msg_queue.qsize()} Normal` + `{vip_queue.qsize()} VIP`\n"
-                f"━━━━━━━━━━━━━━━━━━\n"
-                f"👇 *Select a module to configure:* "
-            )
-            await cb.edit_message_text(text=dash_text, reply_markup=get_main_menu())
+    def decorator(func):
+        @app.on_callback_query(filters.regex(pattern) & admin_filter)
+        async def wrapper(client: Client, cb: CallbackQuery):
+            try:
+                await func(client, cb)
+            except MessageNotModified:
+                pass
+            except Exception as e:
+                logger.error("Callback Error [%s]: %s", cb.data, e)
+                await cb.answer("❌ Error!", show_alert=True)
+        return func
+    return decorator
+
+
+# Built once: only the {placeholders} change per render, so each call
+# formats into the shared literal instead of re-assembling 12 f-pieces
+DASHBOARD_TMPL = (
+    "🎛 **ENTERPRISE CONTROL HUB**\n"
+    "━━━━━━━━━━━━━━━━━━\n"
+    "👋 **Welcome:** `{name}`\n"
+    "🛡️ **Access Level:** `{level}`\n"
+    "━━━━━━━━━━━━━━━━━━\n"
+    "📊 **LIVE TELEMETRY**\n"
+    "➤ **Status:** `{status}`\n"
+    "➤ **Uptime:** `{uptime}`\n"
+    "➤ **Queue Depth:** `{normal_n} Normal` + `{vip_n} VIP`\n"
+    "━━━━━━━━━━━━━━━━━━\n"
+    "👇 *Select a module to configure:* "
+)
 
-        # --- ⏯️ SYSTEM CONTROL (Super Admin Only) ---
-        elif data in ["pause_bot", "resume_bot"]:
-            if user_id != SUPER_ADMIN_ID:
-                await cb.answer("⛔ Only the Owner can Pause/Resume the system!", show_alert=True)
-                return
 
-            if data == "pause_bot":
-                db.set_setting("is_paused", "1")
-                await cb.answer("⚠️ System Halted!")
-            else:
-                db.set_setting("is_paused", "0")
-                await cb.answer("🚀 System Resumed!")
-            
-            # Refresh Dashboard to show new status
-            await callback_router(client, cb)
-
-        # --- 🔄 MODE SWITCHING ---
-        elif data == "toggle_mode":
-            curr = db.get_setting("mode", "copy")
-            new_mode = "forward" if curr == "copy" else "copy"
-            db.set_setting("mode", new_mode)
-            
-            txt = "⏩ Forward (Tag)" if new_mode == "forward" else "©️ Copy (No Tag)"
-            await cb.answer(f"Mode Switched to: {txt}")
-            await callback_router(client, cb) # Refresh UI
-
-        # --- 🎭 STICKER CONTROLS (NEW INJECTIONS) ---
-        elif data == "menu_stickers":
-            await cb.edit_message_text(
-                "🎭 **STICKER STUDIO PRO**\n"
-                "━━━━━━━━━━━━━━━━━━\n"
-                "Configure automated engagement stickers.\n"
-                "• **Random:** Picks from your added packs.\n"
-                "• **Single:** Uses one specific sticker always.\n"
-                "• **Smart Album:** Prevents spam in photo albums.",
-                reply_markup=get_sticker_menu()
-            )
+async def show_dashboard(cb: CallbackQuery):
+    """Renders the Control Hub (shared by home/refresh/toggle handlers)."""
+    user_id = cb.from_user.id
+    if user_id in user_input_mode: del user_input_mode[user_id]
+
+    paused = db.is_paused()
+    vip_n = _vip_backlog()
+
+    dash_text = DASHBOARD_TMPL.format(
+        name=cb.from_user.first_name,
+        level='Super Admin' if user_id == SUPER_ADMIN_ID else 'Admin',
+        status="🔴 SYSTEM PAUSED" if paused else "🟢 SYSTEM ONLINE",
+        uptime=get_uptime(),
+        normal_n=publish_queue.qsize() - vip_n,
+        vip_n=vip_n,
+    )
+    await cb.edit_message_text(text=dash_text, reply_markup=get_main_menu())
 
-        # Toggle ON/OFF
-        elif data == "toggle_sticker_on":
-            db.set_setting("sticker_state", "ON")
-            await cb.answer("✅ Stickers Enabled")
-            await cb.edit_message_reply_markup(get_sticker_menu())
-            
-        elif data == "toggle_sticker_off":
-            db.set_setting("sticker_state", "OFF")
-            await cb.answer("🚫 Stickers Disabled")
-            await cb.edit_message_reply_markup(get_sticker_menu())
-
-        # Toggle Random/Single
-        elif data == "set_mode_random":
-            db.set_setting("sticker_mode", "RANDOM")
-            await cb.answer("🎲 Mode: Random Packs")
-            await cb.edit_message_reply_markup(get_sticker_menu())
-
-        elif data == "set_mode_single":
-            db.set_setting("sticker_mode", "SINGLE")
-            await cb.answer("🎯 Mode: Single Fixed Sticker")
-            await cb.edit_message_reply_markup(get_sticker_menu())
-
-        elif data == "ask_single_sticker":
-            user_input_mode[user_id] = "SET_SINGLE_STICKER"
-            await cb.edit_message_text(
-                "🎯 **SET FIXED STICKER**\n\n"
-                "👉 Please send the **One Sticker** you want to use.",
-                reply_markup=get_cancel_kb()
-            )
 
-        elif data == "ask_sticker":
-            user_input_mode[user_id] = "ADD_STICKER"
-            await cb.edit_message_text(
-                "➕ **ADD STICKER PACK**\n\n"
-                "👉 Send a **Sticker** from the pack OR the **Link**.\n"
-                "Ex: `https://t.me/addstickers/Animals`",
-                reply_markup=get_cancel_kb()
-            )
+# --- 🏠 DASHBOARD & NAVIGATION ---
+@callback_handler(r"^(back_home|refresh_home)$")
+async def cb_home(client: Client, cb: CallbackQuery):
+    await show_dashboard(cb)
 
-        elif data.startswith("del_pack_"):
-            pack = data.replace("del_pack_", "")
-            db.remove_sticker_pack(pack)
-            await cb.answer("🗑 Pack Removed")
-            await cb.edit_message_reply_markup(get_sticker_menu())
 
-        # --- 📥 QUEUE OPS ---
-        elif data == "view_queue":
-            q_msg = f"🔥 Pending: {msg_queue.qsize()} | ⚡ VIP: {vip_queue.qsize()}"
-            await cb.answer(q_msg, show_alert=True)
-            
-        elif data == "noop":
-            await cb.answer() # Do nothing (Visual Button)
-
-        # --- 📡 INPUT HANDLERS (Standard) ---
-        elif data == "ask_channel":
-            user_input_mode[user_id] = "SET_CHANNEL"
-            await cb.edit_message_text(
-                "📡 **CHANNEL CONFIGURATION**\n"
-                "━━━━━━━━━━━━━━━━━━\n"
-                "1️⃣ **Forward** a message from target channel.\n"
-                "2️⃣ **Send** Channel ID manually (e.g., -100...).",
-                reply_markup=get_cancel_kb()
-            )
+# --- ⏯️ SYSTEM CONTROL (Super Admin Only) ---
+@callback_handler(r"^(pause_bot|resume_bot)$")
+async def cb_pause_resume(client: Client, cb: CallbackQuery):
+    if cb.from_user.id != SUPER_ADMIN_ID:
+        await cb.answer("⛔ Only the Owner can Pause/Resume the system!", show_alert=True)
+        return
 
-        elif data == "ask_delay":
-            user_input_mode[user_id] = "SET_DELAY"
-            await cb.edit_message_text("⏱ **SET DELAY (Seconds)**\n\n👉 Send a number (Min 5).", reply_markup=get_cancel_kb())
+    if cb.data == "pause_bot":
+        db.set_setting("is_paused", "1")
+        run_event.clear()
+        await cb.answer("⚠️ System Halted!")
+    else:
+        db.set_setting("is_paused", "0")
+        run_event.set()
+        await cb.answer("🚀 System Resumed!")
+
+    # Refresh Dashboard to show new status
+    await show_dashboard(cb)
+
+
+# --- 🔄 MODE SWITCHING ---
+@callback_handler(r"^toggle_mode$")
+async def cb_toggle_mode(client: Client, cb: CallbackQuery):
+    curr = db.get_setting("mode", "copy")
+    new_mode = "forward" if curr == "copy" else "copy"
+    db.set_setting("mode", new_mode)
+
+    txt = "⏩ Forward (Tag)" if new_mode == "forward" else "©️ Copy (No Tag)"
+    await cb.answer(f"Mode Switched to: {txt}")
+    await show_dashboard(cb)
+
+
+# --- 🎭 STICKER CONTROLS ---
+@callback_handler(r"^menu_stickers$")
+async def cb_menu_stickers(client: Client, cb: CallbackQuery):
+    await cb.edit_message_text(
+        "🎭 **STICKER STUDIO PRO**\n"
+        "━━━━━━━━━━━━━━━━━━\n"
+        "Configure automated engagement stickers.\n"
+        "• **Random:** Picks from your added packs.\n"
+        "• **Single:** Uses one specific sticker always.\n"
+        "• **Smart Album:** Prevents spam in photo albums.",
+        reply_markup=get_sticker_menu()
+    )
 
-        elif data == "cancel_input":
-            if user_id in user_input_mode: del user_input_mode[user_id]
-            await cb.answer("🚫 Cancelled")
-            await callback_router(client, cb) # Go back to home
 
-        # --- ✍️ FOOTER ---
-        elif data == "menu_footer":
-            await cb.edit_message_text("✍️ **BRANDING SUITE**\nManage your auto-signature.", reply_markup=get_footer_menu())
+# callback_data -> (setting_key, value, toast) — one dict lookup, no chain
+_STICKER_TOGGLES = {
+    "toggle_sticker_on":  ("sticker_state", "ON",     "✅ Stickers Enabled"),
+    "toggle_sticker_off": ("sticker_state", "OFF",    "🚫 Stickers Disabled"),
+    "set_mode_random":    ("sticker_mode",  "RANDOM", "🎲 Mode: Random Packs"),
+    "set_mode_single":    ("sticker_mode",  "SINGLE", "🎯 Mode: Single Fixed Sticker"),
+}
+
+
+@callback_handler(r"^(toggle_sticker_on|toggle_sticker_off|set_mode_random|set_mode_single)$")
+async def cb_sticker_toggles(client: Client, cb: CallbackQuery):
+    key, value, toast = _STICKER_TOGGLES[cb.data]
+    db.set_setting(key, value)
+    await cb.answer(toast)
+    await cb.edit_message_reply_markup(get_sticker_menu())
+
+
+@callback_handler(r"^del_pack_(.+)$")
+async def cb_del_pack(client: Client, cb: CallbackQuery):
+    pack = cb.matches[0].group(1)
+    db.remove_sticker_pack(pack)
+    # Drop its stickers from the flat pick pool too
+    _sticker_cache.pop(pack, None)
+    _rebuild_sticker_flat()
+    await cb.answer("🗑 Pack Removed")
+    await cb.edit_message_reply_markup(get_sticker_menu())
+
+
+# --- 📡 INPUT PROMPTS (set user_input_mode & ask) ---
+# callback_data -> (input_mode, prompt) — table lookup instead of if/elif
+_INPUT_PROMPTS = {
+    "ask_channel": ("SET_CHANNEL",
+        "📡 **CHANNEL CONFIGURATION**\n"
+        "━━━━━━━━━━━━━━━━━━\n"
+        "1️⃣ **Forward** a message from target channel.\n"
+        "2️⃣ **Send** Channel ID manually (e.g., -100...)."),
+    "ask_delay": ("SET_DELAY",
+        "⏱ **SET DELAY (Seconds)**\n\n👉 Send a number (Min 5)."),
+    "ask_footer": ("SET_FOOTER",
+        "✍️ **SEND NEW FOOTER**\nSupports HTML/Markdown."),
+    "ask_sticker": ("ADD_STICKER",
+        "➕ **ADD STICKER PACK**\n\n"
+        "👉 Send a **Sticker** from the pack OR the **Link**.\n"
+        "Ex: `https://t.me/addstickers/Animals`"),
+    "ask_single_sticker": ("SET_SINGLE_STICKER",
+        "🎯 **SET FIXED STICKER**\n\n"
+        "👉 Please send the **One Sticker** you want to use."),
+    "ask_add_admin": ("ADD_ADMIN", "👤 Send **User ID** to Hire."),
+    "ask_rem_admin": ("REM_ADMIN", "👤 Send **User ID** to Fire."),
+}
+
+
+@callback_handler(r"^(ask_channel|ask_delay|ask_footer|ask_sticker|ask_single_sticker|ask_add_admin|ask_rem_admin)$")
+async def cb_ask_input(client: Client, cb: CallbackQuery):
+    mode, prompt = _INPUT_PROMPTS[cb.data]
+    user_input_mode[cb.from_user.id] = mode
+    await cb.edit_message_text(prompt, reply_markup=get_cancel_kb())
+
+
+@callback_handler(r"^cancel_input$")
+async def cb_cancel_input(client: Client, cb: CallbackQuery):
+    if cb.from_user.id in user_input_mode: del user_input_mode[cb.from_user.id]
+    await cb.answer("🚫 Cancelled")
+    await show_dashboard(cb)
+
+
+# --- 📥 QUEUE OPS ---
+@callback_handler(r"^view_queue$")
+async def cb_view_queue(client: Client, cb: CallbackQuery):
+    vip_n = _vip_backlog()
+    q_msg = f"🔥 Pending: {publish_queue.qsize() - vip_n} | ⚡ VIP: {vip_n}"
+    await cb.answer(q_msg, show_alert=True)
+
+
+@callback_handler(r"^noop$")
+async def cb_noop(client: Client, cb: CallbackQuery):
+    await cb.answer()  # Do nothing (Visual Button)
+
+
+# --- ✍️ FOOTER ---
+@callback_handler(r"^menu_footer$")
+async def cb_menu_footer(client: Client, cb: CallbackQuery):
+    await cb.edit_message_text("✍️ **BRANDING SUITE**\nManage your auto-signature.", reply_markup=get_footer_menu())
+
+
+@callback_handler(r"^remove_footer$")
+async def cb_remove_footer(client: Client, cb: CallbackQuery):
+    db.set_setting("footer", "NONE")
+    await cb.answer("🗑 Footer Deleted")
+    await cb.edit_message_reply_markup(get_footer_menu())
+
+
+@callback_handler(r"^view_footer_text$")
+async def cb_view_footer(client: Client, cb: CallbackQuery):
+    ft = db.get_setting("footer", "NONE")
+    await cb.edit_message_text(f"📝 **PREVIEW:**\n\n{ft}", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back", callback_data="menu_footer")]]))
+
+
+# --- ⚙️ ADMINS ---
+@callback_handler(r"^menu_admins$")
+async def cb_menu_admins(client: Client, cb: CallbackQuery):
+    if cb.from_user.id != SUPER_ADMIN_ID:
+        await cb.answer("⛔ Super Admin Only!", show_alert=True)
+        return
+    admins = db.get_all_admins()
+    txt = "**👥 ADMIN TEAM:**\n\n" + "\n".join([f"• `{a}`" for a in admins])
+    kb = [[InlineKeyboardButton("➕ Add", callback_data="ask_add_admin"), InlineKeyboardButton("➖ Remove", callback_data="ask_rem_admin")], [InlineKeyboardButton("🔙 Back", callback_data="back_home")]]
+    await cb.edit_message_text(txt, reply_markup=InlineKeyboardMarkup(kb))
 
-        elif data == "ask_footer":
-            user_input_mode[user_id] = "SET_FOOTER"
-            await cb.edit_message_text("✍️ **SEND NEW FOOTER**\nSupports HTML/Markdown.", reply_markup=get_cancel_kb())
 
-        elif data == "remove_footer":
-            db.set_setting("footer", "NONE")
-            await cb.answer("🗑 Footer Deleted")
-            await cb.edit_message_reply_markup(get_footer_menu())
-            
-        elif data == "view_footer_text":
-            ft = db.get_setting("footer", "NONE")
-            await cb.edit_message_text(f"📝 **PREVIEW:**\n\n{ft}", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back", callback_data="menu_footer")]]))
-
-        # --- ⚙️ ADMINS ---
-        elif data == "menu_admins":
-            if user_id != SUPER_ADMIN_ID:
-                await cb.answer("⛔ Super Admin Only!", show_alert=True)
-                return
-            admins = db.get_all_admins()
-            txt = "**👥 ADMIN TEAM:**\n\n" + "\n".join([f"• `{a}`" for a in admins])
-            kb = [[InlineKeyboardButton("➕ Add", callback_data="ask_add_admin"), InlineKeyboardButton("➖ Remove", callback_data="ask_rem_admin")], [InlineKeyboardButton("🔙 Back", callback_data="back_home")]]
-            await cb.edit_message_text(txt, reply_markup=InlineKeyboardMarkup(kb))
-
-        elif data == "ask_add_admin":
-            user_input_mode[user_id] = "ADD_ADMIN"
-            await cb.edit_message_text("👤 Send **User ID** to Hire.", reply_markup=get_cancel_kb())
-
-        elif data == "ask_rem_admin":
-            user_input_mode[user_id] = "REM_ADMIN"
-            await cb.edit_message_text("👤 Send **User ID** to Fire.", reply_markup=get_cancel_kb())
-            
-        # --- 📊 STATS ---
-        elif data == "view_stats":
-            stats = db.get_total_stats()
-            txt = f"📊 **STATS**\n✅ Sent: `{stats['processed']}`\n🎭 Stickers: `{stats['stickers']}`\n❌ Errors: `{stats['errors']}`"
-            await cb.edit_message_text(txt, reply_markup=get_back_home_kb())
-
-    except MessageNotModified:
-        pass 
-    except Exception as e:
-        logger.error(f"Callback Error: {e}")
-        await cb.answer("❌ Error!", show_alert=True)
+# --- 📊 STATS ---
+@callback_handler(r"^view_stats$")
+async def cb_view_stats(client: Client, cb: CallbackQuery):
+    stats = db.get_total_stats()
+    txt = f"📊 **STATS**\n✅ Sent: `{stats['processed']}`\n🎭 Stickers: `{stats['stickers']}`\n❌ Errors: `{stats['errors']}`"
+    await cb.edit_message_text(txt, reply_markup=get_back_home_kb())
 
 # ==============================================================================
 #                           INPUT MESSAGE HANDLER (ENTERPRISE)
 # ==============================================================================
 
-@app.on_message(filters.private & ~filters.bot & ~filters.command(["restore", "logs"]))
+# Per-mode input handlers. Each returns True when the input was accepted
+# (clears the mode) or False to keep the admin in the mode for a retry.
+# Dispatched via _INPUT_DISPATCH — one dict lookup instead of walking an
+# if/elif chain of string compares on every configuration message.
+
+async def _in_set_channel(client: Client, message: Message) -> bool:
+    target = None
+    if message.forward_from_chat:
+        target = message.forward_from_chat.id
+        title = message.forward_from_chat.title
+    elif message.text:
+        # isdigit pre-check beats exception unwinding on junk input
+        txt = message.text.strip()
+        if txt.lstrip('-').isdigit():
+            target = int(txt)
+            title = "Manual ID"
+
+    if not target:
+        await message.reply_text("❌ Invalid Input. Forward a message or send ID.")
+        return False
+    db.set_setting("target_channel", str(target))
+    _peer_cache.clear()  # Old resolved peer is obsolete
+    await message.reply_text(
+        f"✅ **Target Channel Locked!**\nID: `{target}`\nName: `{title}`",
+        reply_markup=get_back_home_kb()
+    )
+    return True
+
+
+async def _in_set_delay(client: Client, message: Message) -> bool:
+    txt = (message.text or "").strip()
+    if not (txt.isdigit() and int(txt) >= 5):
+        await message.reply_text("❌ Invalid! Minimum delay is 5 seconds.")
+        return False
+    db.set_setting("delay", txt)
+    await message.reply_text(f"⏱ **Delay Updated:** `{txt} seconds`", reply_markup=get_back_home_kb())
+    return True
+
+
+async def _in_set_footer(client: Client, message: Message) -> bool:
+    text = message.text.html if message.text else "NONE"
+    db.set_setting("footer", text)
+    await message.reply_text("✍️ **Branding Footer Updated!**", reply_markup=get_footer_menu())
+    return True
+
+
+async def _in_add_sticker(client: Client, message: Message) -> bool:
+    pack_name = None
+    if message.sticker:
+        pack_name = message.sticker.set_name
+    elif message.text:
+        m = _STICKER_LINK_RE.search(message.text)
+        pack_name = m.group(1) if m else message.text.strip()
+
+    if not pack_name:
+        await message.reply_text("❌ Error. Send a sticker or a valid link.")
+        return False
+    pack_name = pack_name.rsplit('/', 1)[-1]
+    db.add_sticker_pack(pack_name)
+    # Debounced prefetch: the new pack joins the random pool
+    # in ~2s without waiting for the 5-minute refresher
+    _schedule_pack_prefetch(client, pack_name)
+    await message.reply_text(f"✅ **Pack Added:** `{pack_name}`", reply_markup=get_sticker_menu())
+    return True
+
+
+async def _in_set_single_sticker(client: Client, message: Message) -> bool:
+    if not message.sticker:
+        await message.reply_text("❌ Please send a Sticker.")
+        return False
+    db.set_setting("single_sticker_id", message.sticker.file_id)
+    db.set_setting("sticker_mode", "SINGLE")  # Auto-switch to single mode
+    await message.reply_text("🎯 **Fixed Sticker Set!**\nSystem is now in 'Single Sticker' mode.", reply_markup=get_sticker_menu())
+    return True
+
+
+async def _in_add_admin(client: Client, message: Message) -> bool:
+    txt = (message.text or "").strip()
+    if not txt.isdigit():
+        await message.reply_text("❌ Send Numeric User ID.")
+        return False
+    new_id = int(txt)
+    db.add_admin(new_id, message.from_user.id)
+    await message.reply_text(f"👤 **Admin Hired:** `{new_id}`", reply_markup=get_back_home_kb())
+    return True
+
+
+async def _in_rem_admin(client: Client, message: Message) -> bool:
+    txt = (message.text or "").strip()
+    if not txt.isdigit():
+        await message.reply_text("❌ Invalid ID.")
+        return False
+    rem_id = int(txt)
+    if rem_id == SUPER_ADMIN_ID:
+        await message.reply_text("🛡️ **Security Alert:** Cannot remove Super Admin.")
+    else:
+        db.remove_admin(rem_id)
+        await message.reply_text(f"🗑 **Admin Fired:** `{rem_id}`", reply_markup=get_back_home_kb())
+    return True
+
+
+_INPUT_DISPATCH = {
+    "SET_CHANNEL": _in_set_channel,
+    "SET_DELAY": _in_set_delay,
+    "SET_FOOTER": _in_set_footer,
+    "ADD_STICKER": _in_add_sticker,
+    "SET_SINGLE_STICKER": _in_set_single_sticker,
+    "ADD_ADMIN": _in_add_admin,
+    "REM_ADMIN": _in_rem_admin,
+}
+
+
+@app.on_message(filters.private & admin_filter & ~filters.bot & ~filters.command(["restore", "logs"]))
 async def message_processor(client: Client, message: Message):
     """
     The Gatekeeper 🛡️
@@ -1197,9 +2019,7 @@ async def message_processor(client: Client, message: Message):
     """
     user_id = message.from_user.id
 
-    # 1. SECURITY & AUTHENTICATION
-    if not db.is_admin(user_id):
-        return # Ignore unauthorized users silently
+    # 1. SECURITY: handled by admin_filter before this coroutine exists
 
     # 2. COMMANDS (/start)
     if message.text and message.text.lower() == "/start":
@@ -1215,109 +2035,28 @@ async def message_processor(client: Client, message: Message):
         return
 
     # 3. INPUT MODE HANDLING (Configuration)
-    if user_id in user_input_mode:
-        mode = user_input_mode[user_id]
-        
+    # Single .get() — one hash lookup instead of `in` + [] on every message
+    mode = user_input_mode.get(user_id)
+    if mode is not None:
         try:
-            # --- SET CHANNEL ---
-            if mode == "SET_CHANNEL":
-                target = None
-                if message.forward_from_chat:
-                    target = message.forward_from_chat.id
-                    title = message.forward_from_chat.title
-                elif message.text:
-                    try: target = int(message.text); title = "Manual ID"
-                    except: pass
-                
-                if target:
-                    db.set_setting("target_channel", str(target))
-                    await message.reply_text(
-                        f"✅ **Target Channel Locked!**\nID: `{target}`\nName: `{title}`", 
-                        reply_markup=get_back_home_kb()
-                    )
-                else:
-                    await message.reply_text("❌ Invalid Input. Forward a message or send ID.")
-                    return
-
-            # --- SET DELAY ---
-            elif mode == "SET_DELAY":
-                try:
-                    val = int(message.text)
-                    if val < 5: raise ValueError
-                    db.set_setting("delay", str(val))
-                    await message.reply_text(f"⏱ **Delay Updated:** `{val} seconds`", reply_markup=get_back_home_kb())
-                except:
-                    await message.reply_text("❌ Invalid! Minimum delay is 5 seconds.")
-                    return
-
-            # --- SET FOOTER ---
-            elif mode == "SET_FOOTER":
-                text = message.text.html if message.text else "NONE"
-                db.set_setting("footer", text)
-                await message.reply_text("✍️ **Branding Footer Updated!**", reply_markup=get_footer_menu())
-
-            # --- ADD STICKER PACK (Random Mode) ---
-            elif mode == "ADD_STICKER":
-                pack_name = None
-                if message.sticker:
-                    pack_name = message.sticker.set_name
-                elif message.text:
-                    if "addstickers/" in message.text:
-                        pack_name = message.text.split("addstickers/")[-1].split()[0]
-                    else:
-                        pack_name = message.text.strip()
-                
-                if pack_name:
-                    db.add_sticker_pack(pack_name)
-                    # NOTE: Removed 'refresh_cache' call as we use Raw API now (Crash Fix)
-                    await message.reply_text(f"✅ **Pack Added:** `{pack_name}`", reply_markup=get_sticker_menu())
-                else:
-                    await message.reply_text("❌ Error. Send a sticker or a valid link.")
-                    return
-
-            # --- [NEW] SET SINGLE STICKER (Fixed Mode) ---
-            elif mode == "SET_SINGLE_STICKER":
-                if message.sticker:
-                    file_id = message.sticker.file_id
-                    db.set_setting("single_sticker_id", file_id)
-                    db.set_setting("sticker_mode", "SINGLE") # Auto-switch to single mode
-                    await message.reply_text("🎯 **Fixed Sticker Set!**\nSystem is now in 'Single Sticker' mode.", reply_markup=get_sticker_menu())
-                else:
-                    await message.reply_text("❌ Please send a Sticker.")
-                    return
+            handler = _INPUT_DISPATCH.get(mode)
+            # True (or an unknown mode) clears the input state; False keeps
+            # the admin in the mode so they can retry with valid input
+            if handler is None or await handler(client, message):
+                user_input_mode.pop(user_id, None)
 
-            # --- ADMIN MANAGEMENT ---
-            elif mode == "ADD_ADMIN":
-                try:
-                    new_id = int(message.text)
-                    db.add_admin(new_id, user_id)
-                    await message.reply_text(f"👤 **Admin Hired:** `{new_id}`", reply_markup=get_back_home_kb())
-                except:
-                    await message.reply_text("❌ Send Numeric User ID.")
-                    return
-
-            elif mode == "REM_ADMIN":
-                try:
-                    rem_id = int(message.text)
-                    if rem_id == SUPER_ADMIN_ID:
-                        await message.reply_text("🛡️ **Security Alert:** Cannot remove Super Admin.")
-                    else:
-                        db.remove_admin(rem_id)
-                        await message.reply_text(f"🗑 **Admin Fired:** `{rem_id}`", reply_markup=get_back_home_kb())
-                except:
-                    await message.reply_text("❌ Invalid ID.")
-                    return
-
-            # Cleanup Input Mode
-            del user_input_mode[user_id]
-        
         except Exception as e:
-            logger.error(f"Input Handler Error: {e}")
+            logger.error("Input Handler Error: %s", e)
             await message.reply_text(f"❌ Error: {e}", reply_markup=get_back_home_kb())
-        
+
         return
 
     # 4. QUEUE INGESTION (File Uploads)
+    # Empty shells (service messages, stray button taps) would still burn
+    # a Telegram RPC downstream — refuse them at the door
+    if not (message.text or message.caption or message.media):
+        return
+
     target_channel = db.get_setting("target_channel")
     if target_channel == "0":
         await message.reply_text("⚠️ **Setup Required!**\nSet a Target Channel first.", reply_markup=get_main_menu())
@@ -1325,55 +2064,91 @@ async def message_processor(client: Client, message: Message):
 
     # --- ⚡ PRIORITY CHECK (VIP Logic) ---
     # Agar caption me #urgent ya #vip hai, to VIP Queue me daalo
+    # 🔁 Duplicate? Same media/text already queued or being sent — skip
+    dedup_key = _dedup_key(message)
+    if dedup_key is not None:
+        if dedup_key in _inflight_keys:
+            logger.info("♻️ Duplicate content skipped (already queued).")
+            return
+        _inflight_keys.add(dedup_key)
+
     is_vip = False
     caption = message.caption or ""
     if "#urgent" in caption.lower() or "#vip" in caption.lower():
         is_vip = True
-        await vip_queue.put(message)
-    else:
-        await msg_queue.put(message)
+    try:
+        enqueue_item(QueuedItem(message), is_vip)
+    except asyncio.QueueFull:
+        # Back-pressure: tell the admin instead of ballooning RAM
+        if dedup_key is not None:
+            _inflight_keys.discard(dedup_key)
+        await message.reply_text(
+            f"⚠️ **Queue Saturated!** ({QUEUE_MAXSIZE} items pending)\n"
+            f"⏳ Please wait for the backlog to drain and resend."
+        )
+        return
+
+    # 💾 Durable copy: a restart replays unprocessed posts from SQLite
+    db.add_pending(message.chat.id, message.id, is_vip)
 
     # --- 📊 LIVE FEEDBACK & BUTTONS ---
     # User ko immediately pata chalna chahiye ki kaam ho gaya
     
     # Calculate Position
-    pos = vip_queue.qsize() if is_vip else msg_queue.qsize()
+    pos = _vip_backlog() if is_vip else publish_queue.qsize()
     queue_type = "⚡ VIP Queue" if is_vip else "📥 Normal Queue"
     
-    # Send Interactive Confirmation
-    # (Agar album hai, to shuru me spam na kare, isliye hum 'reply' use karte hain
-    # jo user ko notification dega)
+    # Send Interactive Confirmation — throttled so a 50-photo burst
+    # doesn't burn 50 outbound messages from the bot's 30 msg/s quota
     try:
-        await message.reply_text(
+        now = time.monotonic()
+        prev = _last_ack.get(user_id)
+        ack_text = (
             f"✅ **Added to {queue_type}**\n"
             f"🔢 Position: `{pos}`\n"
-            f"⏳ Processing in background...",
-            quote=True,
-            reply_markup=get_upload_success_kb() # <-- "Add More" & "Back" Buttons here
+            f"⏳ Processing in background..."
         )
+        if prev is not None and now - prev[1] < 5:
+            pass  # Acked moments ago; stay silent
+        elif prev is not None and now - prev[1] < 60:
+            # Refresh the existing ack in place
+            await client.edit_message_text(
+                user_id, prev[0], ack_text,
+                reply_markup=get_upload_success_kb()
+            )
+            _last_ack[user_id] = (prev[0], now)
+        else:
+            sent = await message.reply_text(
+                ack_text,
+                quote=True,
+                reply_markup=get_upload_success_kb() # <-- "Add More" & "Back" Buttons here
+            )
+            _last_ack[user_id] = (sent.id, now)
     except Exception as e:
-        logger.error(f"Feedback Error: {e}")
+        logger.error("Feedback Error: %s", e)
 
 # ==============================================================================
 #                           COMMAND HANDLERS
 # ==============================================================================
 
-@app.on_message(filters.command("start") & filters.private)
+START_TMPL = (
+    "🤖 **Enterprise Publisher Dashboard**\n"
+    "━━━━━━━━━━━━━━━━━━\n"
+    "👋 Welcome, Boss `{name}`!\n"
+    "⚡ System is **Online** and ready.\n"
+    "━━━━━━━━━━━━━━━━━━"
+)
+
+
+@app.on_message(filters.command("start") & filters.private & admin_filter)
 async def start_handler(client: Client, message: Message):
     """Shows the Main Dashboard."""
-    if not db.is_admin(message.from_user.id):
-        return
-    
     # Clear any stuck input modes
     if message.from_user.id in user_input_mode:
         del user_input_mode[message.from_user.id]
 
     await message.reply(
-        f"🤖 **Enterprise Publisher Dashboard**\n"
-        f"━━━━━━━━━━━━━━━━━━\n"
-        f"👋 Welcome, Boss `{message.from_user.first_name}`!\n"
-        f"⚡ System is **Online** and ready.\n"
-        f"━━━━━━━━━━━━━━━━━━",
+        START_TMPL.format(name=message.from_user.first_name),
         reply_markup=get_main_menu()
     )
 
@@ -1404,150 +2179,44 @@ async def restore_handler(client: Client, message: Message):
         # Download and overwrite existing DB
         await message.reply_to_message.download(file_name=DB_NAME)
         
-        # Re-initialize DB Connection
-        db.connect() 
-        
+        # Re-initialize DB Connection + reload RAM caches from the new file
+        db.connect()
+        db._warm_caches()
+
+        # The backup carries its own is_paused flag — re-sync the worker
+        # gate or the dashboard and the workers disagree until restart
+        if db.is_paused():
+            run_event.clear()
+        else:
+            run_event.set()
+
         await status.edit("✅ **Restore Complete!**\nSystem updated with backup data.")
     except Exception as e:
         await message.reply(f"❌ Restore Failed: {e}")
 
-# ==============================================================================
-#                           MAIN INPUT PROCESSOR
-# ==============================================================================
-
-@app.on_message(filters.private & ~filters.bot)
-async def message_processor(client: Client, message: Message):
-    """
-    The Master Input Handler 🛡️
-    Handles: Config Inputs AND Content Queuing with Feedback.
-    """
-    user_id = message.from_user.id
-    if not db.is_admin(user_id): return
-
-    # --- A. CONFIGURATION MODE ---
-    if user_id in user_input_mode:
-        mode = user_input_mode[user_id]
-        try:
-            # 1. Channel Setup
-            if mode == "SET_CHANNEL":
-                target = None
-                if message.forward_from_chat: target = message.forward_from_chat.id
-                elif message.text: 
-                    try: target = int(message.text)
-                    except: pass
-                
-                if target:
-                    db.set_setting("target_channel", str(target))
-                    await message.reply(f"✅ **Target Channel Set:** `{target}`", reply_markup=get_back_home_kb())
-                else:
-                    await message.reply("❌ Invalid ID. Forward from channel or send ID.")
-                    return
-
-            # 2. Delay Setup
-            elif mode == "SET_DELAY":
-                try:
-                    val = int(message.text)
-                    if val < 5: raise ValueError
-                    db.set_setting("delay", str(val))
-                    await message.reply(f"⏱ **Delay Updated:** `{val}s`", reply_markup=get_back_home_kb())
-                except:
-                    await message.reply("❌ Number must be > 5.")
-                    return
-
-            # 3. Footer Setup
-            elif mode == "SET_FOOTER":
-                txt = message.text.html if message.text else "NONE"
-                db.set_setting("footer", txt)
-                await message.reply("✍️ **Footer Updated!**", reply_markup=get_footer_menu())
-
-            # 4. Sticker Pack (Random)
-            elif mode == "ADD_STICKER":
-                pack = None
-                if message.sticker: pack = message.sticker.set_name
-                elif message.text: pack = message.text.split('/')[-1] if '/' in message.text else message.text
-                
-                if pack:
-                    db.add_sticker_pack(pack)
-                    await message.reply(f"✅ **Pack Added:** `{pack}`", reply_markup=get_sticker_menu())
-                else:
-                    await message.reply("❌ Invalid Sticker/Link.")
-                    return
-
-            # 5. Single Sticker (Fixed)
-            elif mode == "SET_SINGLE_STICKER":
-                if message.sticker:
-                    db.set_setting("single_sticker_id", message.sticker.file_id)
-                    db.set_setting("sticker_mode", "SINGLE")
-                    await message.reply("🎯 **Single Sticker Mode Activated!**", reply_markup=get_sticker_menu())
-                else:
-                    await message.reply("❌ Please send a sticker.")
-                    return
-
-            # 6. Admin Mgmt
-            elif mode == "ADD_ADMIN":
-                try:
-                    db.add_admin(int(message.text), user_id)
-                    await message.reply("👤 **Admin Added.**", reply_markup=get_back_home_kb())
-                except: await message.reply("❌ Invalid ID.")
-                return
-
-            elif mode == "REM_ADMIN":
-                try:
-                    db.remove_admin(int(message.text))
-                    await message.reply("🗑 **Admin Removed.**", reply_markup=get_back_home_kb())
-                except: await message.reply("❌ Invalid ID.")
-                return
-
-            # Cleanup
-            del user_input_mode[user_id]
-        
-        except Exception as e:
-            logger.error(f"Input Error: {e}")
-            await message.reply("❌ Error occurred.", reply_markup=get_back_home_kb())
-        return
-
-    # --- B. CONTENT QUEUEING (The Smart Part) ---
-    
-    # 1. Check Pre-requisites
-    if db.get_setting("target_channel") == "0":
-        await message.reply("⚠️ **Target Channel Missing!** Set it in dashboard.", reply_markup=get_main_menu())
-        return
-
-    # 2. Visual Feedback (Immediate)
-    # User ko lagega bot fast hai
-    status_msg = await message.reply("⏳ **Processing...**", quote=True)
-
-    # 3. Priority Logic (VIP)
-    is_vip = False
-    caption = message.caption or ""
-    if "#urgent" in caption.lower() or "#vip" in caption.lower():
-        is_vip = True
-        await vip_queue.put(message)
-        q_type = "⚡ VIP Queue"
-    else:
-        await msg_queue.put(message)
-        q_type = "📥 Normal Queue"
-
-    # 4. Calculate Position
-    pos = vip_queue.qsize() if is_vip else msg_queue.qsize()
-
-    # 5. Final Confirmation (Edit the Loading Message)
-    # Buttons add kiye hain taaki user wahin se decide kare
-    await status_msg.edit(
-        f"✅ **Added to {q_type}**\n"
-        f"🔢 Position: `{pos}`\n"
-        f"🚀 Uploading in background...",
-        reply_markup=get_upload_success_kb()
-    )
-
 # ==============================================================================
 #                           MAIN EXECUTOR
 # ==============================================================================
 
 async def main():
     """Starts the Enterprise Bot System."""
-    # 1. Clear Console
-    os.system('cls' if os.name == 'nt' else 'clear')
+    # ⚡ Eager tasks (py3.12+): coroutines that finish before their first
+    # real await — cache-hit sticker sends, debounced prefetch no-ops —
+    # skip the call_soon scheduling round-trip entirely
+    if hasattr(asyncio, "eager_task_factory"):
+        asyncio.get_running_loop().set_task_factory(asyncio.eager_task_factory)
+
+    # Keep Render Alive (Web Server) — aiohttp on this same loop, so no
+    # extra OS thread. Set KEEP_ALIVE=0 to skip it (e.g. on a background
+    # worker dyno that needs no port)
+    if os.getenv("KEEP_ALIVE", "1") == "1":
+        from keep_alive import start_keepalive
+        await start_keepalive()
+
+    # 1. Clear Console (ANSI escape — no shell fork; no-op under docker/systemd)
+    if sys.stdout.isatty():
+        sys.stdout.write("\x1b[2J\x1b[H")
+        sys.stdout.flush()
     print("----------------------------------------------------------------")
     print("       🚀 ENTERPRISE PUBLISHER BOT - STARTING SYSTEM 🚀")
     print("----------------------------------------------------------------")
@@ -1556,50 +2225,85 @@ async def main():
     logger.info("📡 Connecting to Telegram Servers...")
     await app.start()
     
-    # 3. Set Bot Commands (Auto-Menu)
-    # 3. Set Bot Commands (Auto-Menu)
+    # 3+4. Commands menu, identity check and admin notification are
+    # independent I/O — overlap them instead of paying each RTT serially
     commands = [
         BotCommand("start", "🏠 Dashboard"),
         BotCommand("logs", "📜 View Error Logs"),
         BotCommand("restore", "♻️ Restore Backup")
     ]
-    await app.set_bot_commands(commands)
-    logger.info("✅ Bot Commands Menu Updated.")
-    
-    # 4. Notify Super Admin
-    me = await app.get_me()
-    logger.info(f"✅ Logged in as: @{me.username}")
-    
-    try:
-        await app.send_message(
+    results = await asyncio.gather(
+        app.set_bot_commands(commands),
+        app.get_me(),
+        app.send_message(
             SUPER_ADMIN_ID, 
             f"🚀 **Bot Restarted Successfully!**\n"
             f"📅 `{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}`\n"
             f"ℹ️ Send /start to open control panel."
-        )
-    except:
+        ),
+        return_exceptions=True
+    )
+    logger.info("✅ Bot Commands Menu Updated.")
+    me = results[1]
+    if not isinstance(me, Exception):
+        logger.info(f"✅ Logged in as: @{me.username}")
+    if isinstance(results[2], Exception):
         logger.warning("⚠️ Could not DM Super Admin.")
 
     # 5. Start Background Workers
-    worker_task = asyncio.create_task(worker_engine())
-    backup_task = asyncio.create_task(auto_backup_task(app))
+    # ♻️ Replay posts that were still queued when the bot last stopped
+    pending_rows = db.get_pending()
+    if pending_rows:
+        logger.info("♻️ Replaying %d persisted queue items...", len(pending_rows))
+        for chat_id, msg_id, was_vip in pending_rows:
+            try:
+                msg = await app.get_messages(chat_id, msg_id)
+                if msg and not msg.empty:
+                    enqueue_item(QueuedItem(msg), bool(was_vip))
+                    continue
+            except asyncio.QueueFull:
+                break  # Rows left behind replay on the next restart
+            except RPCError:
+                pass
+            db.remove_pending(chat_id, msg_id)  # Source message gone
+
+    # Sync the pause gate with the persisted setting before workers start
+    if not db.is_paused():
+        run_event.set()
+
+    background_tasks = [
+        *(asyncio.create_task(worker_engine(i)) for i in range(WORKER_COUNT)),
+        asyncio.create_task(auto_backup_task(app)),
+        asyncio.create_task(sticker_cache_refresher(app)),
+        asyncio.create_task(stats_flusher()),
+    ]
     
     # 6. Keep Alive
     logger.info("🟢 SYSTEM ONLINE. WAITING FOR COMMANDS.")
     await idle()
     
-    # 7. Shutdown
-    worker_task.cancel()
-    backup_task.cancel()
+    # 7. Shutdown: cancel every background task and WAIT for them to
+    # unwind, so none is left mid-await when the client stops
+    for t in background_tasks:
+        t.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    db.flush_stats()  # Persist counters accumulated since the last flush
+    # The writer is a daemon thread: without this barrier the final flush
+    # (and any trailing settings/pending writes) races process exit
+    await asyncio.to_thread(db.drain_writes)
     await app.stop()
 
 if __name__ == "__main__":
     try:
-        # Keep Render Alive (Web Server)
-        keep_alive()  
-        
-        loop = asyncio.get_event_loop()
-        loop.run_until_complete(main())
+        # ⚡ uvloop: drop-in faster event loop on Linux (optional)
+        try:
+            import uvloop
+            uvloop.install()
+            logger.info("⚡ uvloop installed.")
+        except ImportError:
+            pass
+
+        asyncio.run(main())
     except KeyboardInterrupt:
         print("\n🛑 Stopped by User")
     except Exception as e: